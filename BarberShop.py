@@ -3,7 +3,7 @@ from __future__ import print_function
 """
 Barbershop Simulator! Neat
 General Approach:
-    * Simulate events minute by minute
+    * Simulate events as they happen, jumping from one busy minute to the next (see shopsim.engine)
     * Customer queue is a FIFO list of Customer objects (dicts for now), where FIFO-ness can be overridden by a customer waiting too long
     * Customer, WaitingArea, and Barber are objects each with a proceed() method, which simulates a minute passing in their worlds
     * Shop manager (AI??) deals with ushering customers in and out and assigning them to Barbers
@@ -12,8 +12,12 @@ General Approach:
 ##############################################################################
 #                                   Imports
 # ----------*----------*----------*----------*----------*----------*----------*
+import itertools
 import sys
 import random
+from collections import deque
+
+from shopsim.engine import Manager, describe, OPENED, CLOSED, SHIFT_STARTED, CUT_STARTED, CUT_ENDED
 
 _SHIFT_1 = ["Alto", "Basil", "Camphor", "Diogenes"]
 _SHIFT_2 = ["Eros", "Fatoush", "Glorio", "Heber"]
@@ -24,6 +28,7 @@ _SHIFT_LEN = 60 * 4  # Minutes
 _CLOSING_TIME = 17 * 60  # Minutes
 _SHOP_TIME = 0  # Minutes
 _CUSTOMER_FREQ = 10  # Minutes
+_PATIENCE = 30  # Minutes a customer waits before giving up
 
 
 ##############################################################################
@@ -33,42 +38,67 @@ class Customer(object):
     def __repr__(self):
         return """{} - status '{}', waiting {} minutes""".format(self.name, self.status, self.wait_time)
 
-    def __init__(self, customer_number):
+    def __init__(self, customer_number, patience=_PATIENCE):
         self.name = _CUSTOMER_TEMPLATE.format(customer_number)
         self.status = 'Waiting'
+        self.patience = patience  # Minutes, None waits forever
         self.wait_time = 0
 
     def proceed(self, minutes=1):
         self.wait_time += minutes
 
-        ## Customer is triggered after 30 minutes of waiting!
-        if self.status == "Waiting" and self.wait_time > 30:
+        ## Customer is triggered after waiting longer than their patience!
+        if self.status == "Waiting" and self.patience is not None and self.wait_time > self.patience:
             self.status = "unfulfilled"
 
 
 class WaitingArea(object):
-    """FIFO-like customer queue object
-    [(recently arrived) ... (waiting) ... (waiting a long time)]
+    """FIFO customer queue object, bounded to _MAX_CUSTOMERS customers
+    [(waiting a long time) ... (waiting) ... (recently arrived)]
+    Customers leaving from the middle are only marked gone and dropped once they reach the front,
+    so adding, seating and removing customers are all O(1) (amortized), however long the line
     """
 
     def __init__(self):
-        self.customers = []
+        self._line = deque()
+        self._gone = set()
+
+    def __len__(self):
+        return len(self._line) - len(self._gone)
+
+    def __iter__(self):
+        """Waiting customers, longest waiting first
+        """
+        for customer in self._line:
+            if customer not in self._gone:
+                yield customer
 
     def add_customer(self, customer):
         """Add customer to waiting area if there is room. Otherwise send back to management
         """
         ## If shop is full, return customer to management
-        if len(self.customers) >= _MAX_CUSTOMERS:
+        if len(self) >= _MAX_CUSTOMERS:
             customer.status = "impatient"
             return customer
 
         ## Add to waiting area
-        self.customers = [customer] + self.customers
+        self._line.append(customer)
 
     def get_patient_customer(self):
-        """Retunrs longest waiting customer
+        """Returns longest waiting customer
         """
-        return self.customers.pop()
+        while self._line[0] in self._gone:
+            self._gone.remove(self._line.popleft())
+        return self._line.popleft()
+
+    def remove_customer(self, customer):
+        """Take a customer out of the line, wherever they are in it
+        """
+        self._gone.add(customer)
+        ## Mostly gone people in line? Sweep them out in one go
+        if len(self._gone) > len(self):
+            self._line = deque(self)
+            self._gone.clear()
 
     def proceed(self, minutes=1):
         """Simulate time
@@ -76,14 +106,16 @@ class WaitingArea(object):
         * If they've been waiting for too long, or the shop has closed, boot em back out to management
         """
         rejects = []
-        for ix, customer in enumerate(self.customers):
-            customer.proceed()
+        for customer in reversed(list(self)):
+            customer.proceed(minutes)
             if customer.status == "unfulfilled":
-                rejects.append(self.customers.pop(ix))
+                rejects.append(customer)
             ## Closing time, kick em all out
             elif _SHOP_TIME > 2 * _SHIFT_LEN:
                 customer.status = "furious"
-                rejects.append(self.customers.pop(ix))
+                rejects.append(customer)
+        for customer in rejects:
+            self.remove_customer(customer)
         return rejects
 
 
@@ -156,10 +188,10 @@ def manage_day():
     1. Usher new customers into the waiting area
     2. Check on the barbers, see if they are done with a customer
     3. Get customer from waiting area into that seat!
+    The Manager (see shopsim.engine) does all of that, but only at the minutes where something is due
     """
     ## Start the shift clock
-    global _SHOP_TIME
-    _SHOP_TIME = 0  # Ick. Globals. Shoulda made a Manager() or BarberShop() class that handles all this
+    _set_shop_time(0)
     print("{} Barber shop opened".format(clock()))
 
     ## Have all of the shift_1 barbers clock in
@@ -168,73 +200,33 @@ def manage_day():
     ## Dust and freshen the waiting area
     waitingArea = WaitingArea()
 
-    ## Get nametags ready
-    customer_number = 1
-
-    while (_SHOP_TIME < 2 * _SHIFT_LEN) or barbers:
-        ###### 0. Clear out waiting area (except beginning of day)
-        if _SHOP_TIME != 0:
-            rejects = waitingArea.proceed()
-            ## Usher any out that are unfulfilled
-            if rejects:
-                for customer in rejects:
-                    print("{} {} left {}".format(clock(), customer.name, customer.status))
-
-        ###### 1. Usher in new customers (arrives every 10 minutes)
-        if _SHOP_TIME % _CUSTOMER_FREQ == 0:
-            ## Yay! New customer
-            customer = Customer(customer_number)
-            print("{} {} entered".format(clock(), customer.name))
-            customer_number += 1
-
-            ## Too late though?
-            if _SHOP_TIME >= 2 * _SHIFT_LEN:
-                customer.status = "cursing himself"
-                print("{} {} leaves {}".format(clock(), customer.name, customer.status))
-
-            else:
-                ## Add to waiting area
-                reject = waitingArea.add_customer(customer)
-                if reject:
-                    print("{} {} left {}".format(clock(), reject.name, reject.status))
-
-        ###### 2./3. Check on barbers, put customers in seats
-        for ix, barber in enumerate(barbers):
-            barber.proceed()
-
-            ## Finished with a customer?
-            if barber.status == "Done":
-                ## Usher his customer out.
-                print("{} {} left {}".format(clock(), barber.customer.name, barber.customer.status))
-                barber.status = "Ready"
-                barber.customer = None
-
-            ## Ready for a new one (can happen after finshed with previous)
-            if barber.status == "Ready":
-                ## Bring any waiting customers to this barber
-                if waitingArea.customers:
-                    barber.cut(waitingArea.get_patient_customer())
-
-            ## Done with shift? Sub in a new one
-            if barber.status == "Leaving":
-                print("{} {} ended shift".format(clock(), barber.name))
-
-                ## Remove this barber from the list of barbers
-                barbers.pop(ix)
-
-                ## Add a new barber to those on shift from any _SHIFT_2 ones ready and waiting
-                if _SHIFT_2:
-                    barbers.append(Barber(_SHIFT_2.pop()))
-
-            ## Otherwise keep at it
-            # else:
-
-        ###### All checks done, whew, it's a new minute already
-        _SHOP_TIME += 1
+    ## Stay open until the last barber went home; shift_2 barbers take over as shift_1 ones leave
+    manager = Manager(barbers, waitingArea, _announce,
+                      closing=_CLOSING_TIME - _OPEN_TIME, shift_len=_SHIFT_LEN,
+                      last_entry=2 * _SHIFT_LEN, kick_out=2 * _SHIFT_LEN,
+                      relief=_SHIFT_2, make_barber=Barber, on_time=_set_shop_time)
+
+    ## Get nametags ready, a new customer arrives every 10 minutes
+    customer_numbers = itertools.count(1)
+    manager.walk_ins(_CUSTOMER_FREQ, lambda: Customer(next(customer_numbers)))
+
+    manager.run()
     print("{} Barber shop closed".format(clock()))
     return None
 
 
+def _announce(minute, kind, subject):
+    """Print what the manager saw happen (barbers announce their own shifts and cuts, the day its opening hours)
+    """
+    if kind not in (OPENED, CLOSED, SHIFT_STARTED, CUT_STARTED, CUT_ENDED):
+        print(describe(kind, subject, clock()))
+
+
+def _set_shop_time(minutes):
+    global _SHOP_TIME
+    _SHOP_TIME = minutes  # Ick. Globals. Barbers read the clock() too
+
+
 ##############################################################################
 #                                   Runtime
 # ----------*----------*----------*----------*----------*----------*----------*
@@ -1,161 +1,280 @@
+import bisect
 import random
 import re
 import sys
+import time
+from array import array
 from builtins import super, str, range
+from collections import deque
 
 from PySide2 import QtWidgets, QtCore
-from PySide2.QtCore import Qt
+from PySide2.QtCore import Qt, QAbstractListModel, QAbstractTableModel, QModelIndex, QTimer, QThread, Signal
 from PySide2.QtGui import QFont
-from PySide2.QtWidgets import QWidget, QHBoxLayout, QTableWidget, QPushButton, QApplication, QVBoxLayout, \
-    QTableWidgetItem, QCheckBox, QAbstractItemView, QLabel
-from faker import Factory
+from PySide2.QtWidgets import QWidget, QHBoxLayout, QTableView, QPushButton, QApplication, QVBoxLayout, \
+    QHeaderView, QCheckBox, QAbstractItemView, QLabel, QListView, QLineEdit, QFileDialog
 
-RANDOM_SEED = 42  # 随机种子
+import shopsim
+from shopsim import CustomerTable, EventLog, clock, unclock, SHIFT_STARTED
+from shopsim.schedule import ScheduleError, read_csv, write_csv, whole_number
 
-_CUSTOMER_TEMPLATE = "Customer-{:d}:{:s}"
-_OPEN_TIME = 9 * 60  # Minutes
-_SHIFT_LEN = 60 * 4  # Minutes
-_CLOSING_TIME = 17 * 60  # Minutes
-_SHOP_TIME = 0  # Minutes
-_CUSTOMER_FREQ = 10  # Minutes
+RANDOM_SEED = 42  # 随机种子
+_LOG_REFRESH = 100  # Milliseconds between log view updates
+_PROGRESS = 50  # Milliseconds between batches of events / progress from a running simulation
 
 
 ##############################################################################
 #                                  Classes
 # ----------*----------*----------*----------*----------*----------*----------*
-class Customer(object):
-    def __repr__(self):
-        return """{} - status '{}', waiting {} minutes""".format(self.name, self.status, self.wait_time)
+class EventLogModel(QAbstractListModel):
+    """List model over an EventLog (调度信息)
+    New events only show up on the next refresh tick, in one batch, so a busy day doesn't redraw per event;
+    the view only asks for the rows it has on screen. `set_filter` narrows it to one customer or barber
+    """
 
-    def __init__(self, customer_number, name, arrive_time, serve_time):
-        self.name = _CUSTOMER_TEMPLATE.format(customer_number, name)
-        self.status = 'Waiting'
-        self.arrive_time = arrive_time  # 到达时间
-        self.serve_time = serve_time  # 服务时间
-        self.wait_time = 0
+    def __init__(self, log, parent=None):
+        super(EventLogModel, self).__init__(parent)
+        self.log = log
+        self._seen = 0  # Events of the log already taken in
+        self._rows = None  # Log positions shown when filtering, None shows all of them
+        self._who = ""
+        self._timer = QTimer(self)
+        self._timer.setInterval(_LOG_REFRESH)
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._seen if self._rows is None else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        row = index.row()
+        return self.log.text(row if self._rows is None else self._rows[row])
+
+    def refresh(self):
+        """Take in whatever was logged since the last tick
+        """
+        if len(self.log) == self._seen:
+            return
+        if self._rows is None:
+            new, first = len(self.log) - self._seen, self._seen
+        else:
+            matches = self.log.matching(self._who, self._seen)
+            new, first = len(matches), len(self._rows)
+        if new:
+            self.beginInsertRows(QModelIndex(), first, first + new - 1)
+        if self._rows is not None:
+            self._rows.extend(matches)
+        self._seen = len(self.log)
+        if new:
+            self.endInsertRows()
+
+    def set_filter(self, who):
+        """Only show events about customers or barbers with `who` in their name
+        """
+        self.beginResetModel()
+        self._who = who.strip()
+        self._seen = len(self.log)
+        self._rows = self.log.matching(self._who) if self._who else None
+        self.endResetModel()
+
+    def truncate(self, length):
+        """Forget every event from position `length` on, e.g. before putting in a re-run's events instead
+        """
+        self.beginResetModel()
+        self.log.truncate(length)
+        self._seen = len(self.log)
+        if self._rows is not None:
+            del self._rows[bisect.bisect_left(self._rows, length):]
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self.log.clear()
+        self._seen = 0
+        self._rows = [] if self._who else None
+        self.endResetModel()
+
+
+class CustomerTableModel(QAbstractTableModel):
+    """Table model over a CustomerTable (顾客表): ID / 选择 / 顾客名 / 到达时间 / 服务时间
+    选择 is a check state kept in an array next to the table instead of a widget per row, and the view only
+    asks for the cells it has on screen, so 100k customers load and scroll like ten
+    """
+    HEADERS = ['ID', '选择', '顾客名', '到达时间', '服务时间(min)']  # 每列标题
 
-    def proceed(self, minutes=1):
-        self.wait_time += minutes
+    def __init__(self, table=None, parent=None):
+        super(CustomerTableModel, self).__init__(parent)
+        self.table = table if table is not None else CustomerTable()
+        self.checked = array("b", [0]) * len(self.table)
+        self.centered = False
 
-        ## Customer is triggered after 30 minutes of waiting!
-        if self.status == "Waiting" and self.wait_time > 30:
-            self.status = "unfulfilled"
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.table)
 
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
 
-class WaitingArea(object):
-    """FIFO-like customer queue object
-    [(recently arrived) ... (waiting) ... (waiting a long time)]
-    """
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
 
-    def __init__(self, MAX_SIZE=0):
-        self.customers = []
-        self._MAX_CUSTOMERS = MAX_SIZE
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, col = index.row(), index.column()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if col == 0:
+                return str(self.table.number[row])
+            if col == 2:
+                return self.table.given_name(row)
+            if col == 3:
+                return clock(self.table.arrive[row])
+            if col == 4:
+                return str(self.table.serve[row])
+        elif role == Qt.CheckStateRole and col == 1:
+            return Qt.Checked if self.checked[row] else Qt.Unchecked
+        elif role == Qt.TextAlignmentRole and self.centered:
+            return int(Qt.AlignCenter)
+        return None
 
-    def add_customer(self, customer):
-        """Add customer to waiting area if there is room. Otherwise send back to management
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        if index.column() == 1:
+            return Qt.ItemIsEnabled | Qt.ItemIsUserCheckable
+        if index.column() == 0:
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        """Tick 选择, or edit a name, arrival (HH:MM) or service time; bad values are refused
         """
-        ## If shop is full, return customer to management
-        if len(self.customers) >= self._MAX_CUSTOMERS:
-            customer.status = "impatient"
-            return customer
-
-        ## Add to waiting area
-        self.customers = [customer] + self.customers
-
-    def get_patient_customer(self):
-        """Retunrs longest waiting customer
+        if not index.isValid():
+            return False
+        row, col = index.row(), index.column()
+        if role == Qt.CheckStateRole and col == 1:
+            self.checked[row] = 1 if value == Qt.Checked else 0
+        elif role == Qt.EditRole and col > 1:
+            text = str(value).strip()
+            if col == 2 and text:
+                self.table.set_name(row, text)
+            elif col == 3 and is_date_time(text):
+                self.table.arrive[row] = unclock(text)
+            elif col == 4 and whole_number(text) is not None:  # Same check as the CSV import: fits the table
+                self.table.serve[row] = whole_number(text)
+            else:
+                return False
+        else:
+            return False
+        self.dataChanged.emit(index, index)
+        return True
+
+    def append(self, name, arrive_time, serve_time, number):
+        row = len(self.table)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.table.append(name, arrive_time, serve_time, number=number)
+        self.checked.append(0)
+        self.endInsertRows()
+
+    def set_table(self, table):
+        """Show `table` instead (e.g. one read from CSV)
         """
-        return self.customers.pop()
+        self.beginResetModel()
+        self.table = table
+        self.checked = array("b", [0]) * len(table)
+        self.endResetModel()
 
-    def proceed(self, minutes=1):
-        """Simulate time
-        * Have each customer wait a minute
-        * If they've been waiting for too long, or the shop has closed, boot em back out to management
+    def remove_checked(self):
+        """Drop every checked customer in one pass over the table, return how many went
         """
-        rejects = []
-        for ix, customer in enumerate(self.customers):
-            customer.proceed()
-            if customer.status == "unfulfilled":
-                rejects.append(self.customers.pop(ix))
-            ## Closing time, kick em all out
-            elif _SHOP_TIME > 2 * _SHIFT_LEN:
-                customer.status = "furious"
-                rejects.append(self.customers.pop(ix))
-        return rejects
-
-
-class Barber(object):
-    """Barber gets instantiated at begining of shift. Cuts hair until his shift is done. Standard fare
+        gone = sum(self.checked)
+        if gone:
+            self.beginResetModel()
+            self.table.keep([not checked for checked in self.checked])
+            self.checked = array("b", [0]) * len(self.table)
+            self.endResetModel()
+        return gone
+
+    def set_centered(self, centered=True):
+        self.centered = centered
+        if len(self.table):
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.table) - 1, len(self.HEADERS) - 1))
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class SimulationThread(QThread):
+    """One simulated day (启动模拟) off the GUI thread
+    The day is logged into the thread's own EventLog; at most every _PROGRESS ms the events since the last
+    batch go to the GUI in one `logged` signal, together with how far the day got (`progress`), so the
+    window stays live and isn't flooded with a signal per event. cancel() stops it at the next event
+    Without stats the day runs as an IncrementalDay (`day`), so edits to it later re-run from a checkpoint
     """
-
-    def __init__(self, name):
-        self.name = name
-        self.cut_time_left = 0
-        self.time_on_shift = 0
-        self.status = "Ready"  # Ready, Cutting, Done, Leaving
-        self.customer = None
-        print("{} {} started shift".format(clock(), self.name))
-
-    def cut(self, customer):
-        """Start cutting a new customer's hair.
-        """
-        if self.status != "Ready":
-            print("WOAH! Management screwed up, you can't give a barber a customer when they're already with one")
-            return "WOAH! Management screwed up, you can't give a barber a customer when they're already with one"
-        ## Reset the time left barber has to cut hair (20-40 minutes randomly)
-        self.cut_time_left = customer.serve_time
-        self.customer = customer
-        self.status = "Cutting"
-        print("{} {} started cutting {}'s hair".format(clock(), self.name, self.customer.name))
-        return "{} {} started cutting {}'s hair".format(clock(), self.name, self.customer.name)
-
-    def proceed(self, minutes=1):
-        """Simulate time
-        Proceed 1 minute:
-            * Cut hair if cutting
-            * Tell manager you're done if the haircut is finished
-            * Go home if no customer and theyve been working long enough
-        """
-        self.time_on_shift += minutes
-
-        ## Cut hair if you have a customer
-        if self.customer is not None:
-            self.cut_time_left -= minutes
-            if self.cut_time_left <= 0:
-                self.status = "Done"
-                self.customer.status = "satisfied"
-                print("{} {} ended cutting {}'s hair".format(clock(), self.name, self.customer.name))
-                return "{} {} ended cutting {}'s hair".format(clock(), self.name, self.customer.name)
-        else:
-            if (self.time_on_shift > _SHIFT_LEN) or (_SHOP_TIME + _OPEN_TIME >= _CLOSING_TIME):
-                self.status = "Leaving"
-                return None
+    progress = Signal(int, int)  # Minutes simulated, minutes in the day
+    logged = Signal(list)  # EventLog entries since the last batch
+    done = Signal(object, object, bool)  # CustomerTable, PhaseStats (or None), cancelled
+
+    def __init__(self, customers, barbers, seats, t_start, t_end, stats=None, parent=None):
+        super(SimulationThread, self).__init__(parent)
+        self.customers = customers
+        self.barbers = barbers
+        self.seats = seats
+        self.t_start = t_start
+        self.t_end = t_end
+        self.stats = stats
+        self.day = None
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        log = EventLog(self.t_start, skip=(SHIFT_STARTED,))
+        sent, due = [0], [time.perf_counter() + _PROGRESS / 1000.0]
+
+        def flush():
+            if len(log) > sent[0]:
+                self.logged.emit(list(log[sent[0]:len(log)]))
+                sent[0] = len(log)
+
+        def report(minute, kind, subject):
+            if self._cancelled:
+                raise _Cancelled()
+            now = time.perf_counter()
+            if now >= due[0]:
+                due[0] = now + _PROGRESS / 1000.0
+                flush()
+                self.progress.emit(minute, self.t_end - self.t_start)
+
+        def log_and_report(minute, kind, subject):
+            log(minute, kind, subject)
+            report(minute, kind, subject)
+
+        cancelled = False
+        try:
+            if self.stats is None:
+                self.day = shopsim.IncrementalDay(self.customers, self.barbers, self.seats, self.t_start, self.t_end,
+                                                  log, report)
+                self.day.run()
+            else:
+                shopsim.run_table(self.customers, self.barbers, self.seats, self.t_start, self.t_end,
+                                  log_and_report, stats=self.stats)
+        except _Cancelled:
+            cancelled = True
+            self.day = None
+        flush()
+        self.done.emit(self.customers, self.stats, cancelled)
 
 
 ##############################################################################
 #                                   Functions
 # ----------*----------*----------*----------*----------*----------*----------*
-def clock(minutes=None):
-    """Format `minutes` into HH:MM string
-
-    Examples:
-    >>> clock(30)
-    '00:30'
-    >>> clock(150)
-    '02:30'
-    """
-    if minutes is None:
-        minutes = _SHOP_TIME + _OPEN_TIME
-
-    return "{:0>2d}:{:0>2d}".format(minutes // 60, minutes % 60)
-
-
-def unclock(time=None):
-    """Format HH:MM string into `minutes`"""
-    s = time.split(":")
-    return (int(s[0]) * 60 - _SHOP_TIME) + int(s[1])
-
-
 # 消息提示
 def message_dialog(type, msg):
     msg_box = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Warning, type, msg)
@@ -165,7 +284,7 @@ def message_dialog(type, msg):
 # 日期正则判断
 def is_date_time(string):
     return True if (
-                       re.match("([01]?[0-9]|2[0-3]):[0-5][0-9]", string)
+                       re.match("([01]?[0-9]|2[0-3]):[0-5][0-9]$", string)
                    ) is not None else False
 
 
@@ -173,25 +292,35 @@ class ui(QWidget):
     def __init__(self):
         super(ui, self).__init__()
         self.id = 1
-        self.lines = []
         self.editable = True
         self.des_sort = True
-        self.faker = Factory.create()
+        self._faker = None  # Made on first use, Faker is slow to import
 
         # 全局参数
         self.NUM_BARBERS = 2  # 理发师数量
         self.NUM_WAITING = 5  # 等待容量
-        self.T_START = 9  # 开店时间
-        self.T_END = 17  # 关店时间
+        self.T_START = 9 * 60  # 开店时间(Minutes)
+        self.T_END = 17 * 60  # 关店时间(Minutes)
         self._SHIFT_1 = []  # 理发师列表
+        self.customers = None  # 上一次模拟的顾客（CustomerTable），导出CSV时连同结果一起写出
+        self._runs = deque()  # 排队等着跑的模拟：(顾客, 完成时的提示)
+        self._worker = None  # 正在跑的 SimulationThread
+        self._worker_text = ''  # 它跑完时的提示
+        self.day = None  # 上一次模拟（IncrementalDay）：改到达/服务时间后从检查点增量重算，不用从开门重跑
+        self._day_log = 0  # 上一次模拟的调度信息从 self.log 的这个位置开始
+        self._worker_log = 0  # 正在跑的模拟的调度信息从这里开始
 
-        self.current_time = self.T_START * 60
+        self.current_time = self.T_START
 
         self.barberEdit = QtWidgets.QLineEdit()
         self.waitEdit = QtWidgets.QLineEdit()
         self.startEdit = QtWidgets.QLineEdit()
         self.endEdit = QtWidgets.QLineEdit()
 
+        self.log = EventLog(self.T_START, skip=(SHIFT_STARTED,))  # 调度信息
+        self.log_model = EventLogModel(self.log, self)
+        self.customer_model = CustomerTableModel(parent=self)  # 顾客表
+
         self.setupUI()
 
         self.btn_setting.clicked.connect(self.init_data)  # 配置理发店初始参数
@@ -200,16 +329,31 @@ class ui(QWidget):
         self.btn_modify.clicked.connect(self.modify_line)
         self.btn_set_middle.clicked.connect(self.middle)
         self.btn_get_info.clicked.connect(self.hand_sim)
+        self.btn_import.clicked.connect(self.import_csv)
+        self.btn_export.clicked.connect(self.export_csv)
+        self.btn_cancel.clicked.connect(self.cancel_sim)
 
-        self.table.cellChanged.connect(self.cell_change)
+        self.customer_model.dataChanged.connect(self.cell_change)
+        ## 行数变了，上一次模拟的行号就对不上了
+        self.customer_model.rowsInserted.connect(self.forget_day)
+        self.customer_model.rowsRemoved.connect(self.forget_day)
+        self.customer_model.modelReset.connect(self.forget_day)
 
         global original_processes  # 这里我们定义全局变量 - 原始进程列表，是一个二维列表
 
+    @property
+    def faker(self):
+        if self._faker is None:
+            from faker import Factory
+            self._faker = Factory.create()
+        return self._faker
+
     def setupUI(self):
         self.setWindowTitle('理发店模拟')
         self.resize(906, 640)
 
-        self.table = QTableWidget(self)
+        self.table = QTableView(self)
+        self.table.setModel(self.customer_model)
 
         # 初始参数设置
         self.barber = QtWidgets.QLabel("理发师人数：")
@@ -238,6 +382,11 @@ class ui(QWidget):
         self.btn_modify = QPushButton('可以编辑')
         self.btn_set_middle = QPushButton('文字居中')
         self.btn_get_info = QPushButton('启动模拟')
+        self.btn_import = QPushButton('导入CSV')
+        self.btn_export = QPushButton('导出CSV')
+        self.btn_cancel = QPushButton('取消模拟')
+        self.btn_cancel.setEnabled(False)
+        self.stats_box = QCheckBox('性能统计')  # 模拟时统计各阶段耗时，显示在左下角
 
         # 弹簧控件
         self.spacerItem = QtWidgets.QSpacerItem(20, 20, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
@@ -252,6 +401,10 @@ class ui(QWidget):
         self.vbox.addWidget(self.btn_modify)
         self.vbox.addWidget(self.btn_set_middle)
         self.vbox.addWidget(self.btn_get_info)
+        self.vbox.addWidget(self.btn_import)
+        self.vbox.addWidget(self.btn_export)
+        self.vbox.addWidget(self.btn_cancel)
+        self.vbox.addWidget(self.stats_box)
         self.vbox.addSpacerItem(self.spacerItem)
 
         self.txt = QLabel()  # 这是进行操作时显示在最左下角的提示信息
@@ -259,14 +412,24 @@ class ui(QWidget):
 
         self.lab_over = QLabel('调度信息')  # 输出队列顺序
         self.lab_over.setMinimumHeight(20)
-        self.over_Edit = QtWidgets.QTextEdit(self)
+        self.log_filter = QLineEdit(self)  # 按顾客或理发师筛选
+        self.log_filter.setPlaceholderText('按顾客或理发师筛选')
+        self.log_filter.textChanged.connect(self.log_model.set_filter)
+        self.over_Edit = QListView(self)
         self.over_Edit.setMinimumHeight(25)
+        self.over_Edit.setUniformItemSizes(True)  # Lets the view skip measuring rows it doesn't show
+        ## Lay new rows out a slice at a time between other events: a whole day at once stalls the window
+        self.over_Edit.setLayoutMode(QListView.Batched)
+        self.over_Edit.setBatchSize(200)
+        self.over_Edit.setModel(self.log_model)
+        self.log_model.rowsInserted.connect(self.over_Edit.scrollToBottom)
 
         # 垂直布局
         # 把表格和下面的操作提示文本信息按照垂直布局设置，作为嵌套布局方式的另一部分
         self.vbox2 = QVBoxLayout()
         self.vbox2.addWidget(self.table)  # 将表格和下面的操作提示放入垂直布局，先放表格
         self.vbox2.addWidget(self.lab_over)  # 放输出队列
+        self.vbox2.addWidget(self.log_filter)
         self.vbox2.addWidget(self.over_Edit)
 
         self.vbox2.addWidget(self.txt)  # 再放文本框
@@ -286,11 +449,9 @@ class ui(QWidget):
         self.setLayout(self.vbox3)
 
         # 表格基本属性设置
-        self.table.setColumnCount(5)  # 设置列数
         self.table.horizontalHeader().setDefaultAlignment(QtCore.Qt.AlignCenter)
-        self.headers = ['ID', '选择', '顾客名', '到达时间', '服务时间(min)']  # 设置每列标题
-        self.table.setHorizontalHeaderLabels(self.headers)  # 导入
         self.table.verticalHeader().setVisible(False)  # 隐藏垂直表头
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)  # 行高固定，不用逐行测量
         self.show()
 
     # 初始化全局参数
@@ -323,16 +484,11 @@ class ui(QWidget):
             else:
                 self.current_time = self.T_START
             # 清空面板数据
-            self.over_Edit.setText("")
+            self.log_model.clear()
             # 初始化理发师列表
             for i in range(self.NUM_BARBERS):
                 name = self.faker.name()
                 self._SHIFT_1.append(name)
-
-            # 初始化开店时间和关店时间
-            global _OPEN_TIME, _CLOSING_TIME
-            _OPEN_TIME = self.T_START  # Minutes
-            _CLOSING_TIME = self.T_END # Minutes
         else:
             message_dialog("参数错误", "参数不能为空")
 
@@ -340,49 +496,21 @@ class ui(QWidget):
     def add_line(self):
         if self.current_time >= self.T_END:
             return
-        self.table.cellChanged.disconnect()
-        row = self.table.rowCount()  # 获取目前所有行的数量
-        self.table.setRowCount(row + 1)
-        id = str(self.id)
-
-        # 生成复选框， 并设置居中显示
-        ck = QCheckBox()
-        h = QHBoxLayout()
-        h.setAlignment(Qt.AlignCenter)
-        h.addWidget(ck)
-        w = QWidget()
-        w.setLayout(h)
-
         # 变量由faker自动生成
         name = self.faker.name()
         arr_time = random.randint(self.current_time, self.current_time + 60)  # 到达时间
         ser_time = random.randint(10, 30)  # 服务时间
 
-        # 设置新建行的数据
-        self.table.setItem(row, 0, QTableWidgetItem(id))
-        self.table.setCellWidget(row, 1, w)
-        self.table.setItem(row, 2, QTableWidgetItem(name))
-        self.table.setItem(row, 3, QTableWidgetItem(clock(arr_time)))
-        self.table.setItem(row, 4, QTableWidgetItem(str(ser_time)))
+        # 新建一行，选择列是模型里的勾选状态，不再为每行建复选框控件
+        self.customer_model.append(name, arr_time, ser_time, self.id)
 
         self.id += 1  # 设置完不要忘记id加一
         self.current_time = arr_time  # 重置当前时间
-        self.lines.append([id, ck, name, arr_time, ser_time])
         self.set_text('自动生成随机一行数据！,checkbox设置为居中显示')
-        self.table.cellChanged.connect(self.cell_change)
 
     # 删除行
     def del_line(self):
-        removeline = []
-        for line in self.lines:
-            if line[1].isChecked():
-                row = self.table.rowCount()
-                for x in range(row, 0, -1):
-                    if line[0] == self.table.item(x - 1, 0).text():
-                        self.table.removeRow(x - 1)
-                        removeline.append(line)
-        for line in removeline:
-            self.lines.remove(line)
+        self.customer_model.remove_checked()  # 一次遍历删掉所有勾选的行
         self.set_text('删除checkbox中选中状态的行')
         self.current_time = self.T_START  # 初始化时间
 
@@ -400,134 +528,148 @@ class ui(QWidget):
 
     # 文字居中显示
     def middle(self):
-        row = self.table.rowCount()
-        for x in range(row):
-            for y in range(5):
-                if y != 1:
-                    item = self.table.item(x, y)
-                    item.setTextAlignment(Qt.AlignCenter)
-                else:
-                    pass
+        self.customer_model.set_centered()  # 对齐方式由模型给出，不用逐个单元格设置
         self.set_text('将文字居中显示')
 
     # 改变表格数据
-    def cell_change(self, row, col):
-        item = self.table.item(row, col)
-        txt = item.text()
+    def cell_change(self, top_left, bottom_right, roles=()):
+        if top_left != bottom_right:  # 整列刷新（如文字居中），不是编辑
+            return
+        row, col = top_left.row(), top_left.column()
+        txt = top_left.data(Qt.CheckStateRole if col == 1 else Qt.DisplayRole)
         self.set_text('第%s行，第%s列 , 数据改变为:%s' % (row, col, txt))
-
-    def manage_day(self, customers):
-        """This is the manager's job. Watch the clock and take care of customers
-        0. Clear out impatient customers from the waiting area
-        1. Usher new customers into the waiting area
-        2. Check on the barbers, see if they are done with a customer
-        3. Get customer from waiting area into that seat!
-        """
-        ## Start the shift clock
-        global _SHOP_TIME
-        _SHOP_TIME = 0  # Ick. Globals. Shoulda made a Manager() or BarberShop() class that handles all this
-        print("{} Barber shop opened".format(clock()))
-        self.over_Edit.append("{} Barber shop opened".format(clock()))
-
-        ## Have all of the shift_1 barbers clock in
-        barbers = [Barber(name) for name in self._SHIFT_1]
-
-        ## Dust and freshen the waiting area
-        waitingArea = WaitingArea(MAX_SIZE=self.NUM_WAITING)
-
-        ## Get nametags ready
-        customer_number = 1
-
-        # while (_SHOP_TIME < 2 * _SHIFT_LEN) or barbers:
-        while _SHOP_TIME < (_CLOSING_TIME - _OPEN_TIME):
-            ###### 0. Clear out waiting area (except beginning of day)
-            if _SHOP_TIME != 0:
-                rejects = waitingArea.proceed()
-                ## Usher any out that are unfulfilled
-                if rejects:
-                    for customer in rejects:
-                        print("{} {} left {}".format(clock(), customer.name, customer.status))
-                        self.over_Edit.append("{} {} left {}".format(clock(), customer.name, customer.status))
-
-            for customer in customers:
-                if _SHOP_TIME == customer.arrive_time - self.T_START:
-                    self.over_Edit.append("{} {} entered".format(clock(), customer.name))
-                    ## Too late though?
-                    if _SHOP_TIME >= 2 * _SHIFT_LEN:
-                        customer.status = "cursing himself"
-                        print("{} {} leaves {}".format(clock(), customer.name, customer.status))
-                        self.over_Edit.append("{} {} leaves {}".format(clock(), customer.name, customer.status))
-
-                    else:
-                        ## Add to waiting area
-                        reject = waitingArea.add_customer(customer)
-                        if reject:
-                            print("{} {} left {}".format(clock(), reject.name, reject.status))
-                            self.over_Edit.append("{} {} left {}".format(clock(), reject.name, reject.status))
-
-            ###### 2./3. Check on barbers, put customers in seats
-            for ix, barber in enumerate(barbers):
-                res = barber.proceed()
-                if res:
-                    self.over_Edit.append(res)
-                ## Finished with a customer?
-                if barber.status == "Done":
-                    ## Usher his customer out.
-                    print("{} {} left {}".format(clock(), barber.customer.name, barber.customer.status))
-                    self.over_Edit.append("{} {} left {}".format(clock(), barber.customer.name, barber.customer.status))
-                    barber.status = "Ready"
-                    barber.customer = None
-
-                ## Ready for a new one (can happen after finshed with previous)
-                if barber.status == "Ready":
-                    ## Bring any waiting customers to this barber
-                    if waitingArea.customers:
-                        res = barber.cut(waitingArea.get_patient_customer())
-                        self.over_Edit.append(res)
-
-                ## Done with shift? Sub in a new one
-                if barber.status == "Leaving":
-                    print("{} {} ended shift".format(clock(), barber.name))
-                    self.over_Edit.append("{} {} ended shift".format(clock(), barber.name))
-
-                    ## Remove this barber from the list of barbers
-                    barbers.pop(ix)
-
-                    ## Add a new barber to those on shift from any _SHIFT_2 ones ready and waiting
-                    # if _SHIFT_2:
-                    #     barbers.append(Barber(_SHIFT_2.pop()))
-
-                ## Otherwise keep at it
-                # else:
-
-            ###### All checks done, whew, it's a new minute already
-            _SHOP_TIME += 1
-        print("{} Barber shop closed".format(clock()))
-        self.over_Edit.append("{} Barber shop closed".format(clock()))
-        return None
+        if col == 2:  # 改了名字，上一次的调度信息里还是旧名字
+            self.forget_day()
+        elif col in (3, 4):
+            self.resimulate(row)
+
+    # 到达/服务时间改了：从改动之前最近的检查点重算，和上一次一致了就停
+    def resimulate(self, row):
+        day = self.day
+        if day is None or self._worker is not None or (day.barbers, day.seats, day.t_start, day.t_end) != (
+                self._SHIFT_1, self.NUM_WAITING, self.T_START, self.T_END):
+            return
+        if self._day_log + len(day.log) != len(self.log):  # 调度信息清空过，接不上了
+            return
+        table = self.table_customers()
+        start = time.perf_counter()
+        day.edit(row, arrive=table.arrive[row], serve=table.serve[row])
+        seconds = time.perf_counter() - start
+        self.customers = day.table
+        ## 检查点之前的调度信息没变，只换掉之后重算的那一段
+        self.log_model.truncate(self._day_log + day.kept)
+        self.log.extend(day.log[day.kept:len(day.log)])
+        self.log_model.refresh()
+        self.set_text('增量重算：从%s开始，%s，用时%.1f毫秒' % (
+            clock(day.t_start + day.resumed),
+            '到%s与上一次一致' % clock(day.t_start + day.converged) if day.converged is not None else '一直算到关门',
+            seconds * 1000))
+
+    def forget_day(self, *args):
+        self.day = None
 
     # 手动模拟
     def hand_sim(self):
-        # 我们每次使用这个功能时先把全变量原始进程列表 -- original_processes --清空好吧
-        original_processes = []
-        row = self.table.rowCount()
-
-        # 获取顾客数据
-        for j in range(row):
-            na = self.table.item(j, 2).text()
-            at = unclock(self.table.item(j, 3).text())
-            st = int(self.table.item(j, 4).text())
-            c = Customer(j, na, at, st)
-            original_processes.append(c)
-
-        '''
-        由于第一个进程不一定就是到达时间最短的进程，所以我们先按照
-        到达时间给进程排个序
-        '''
-        _sorted_processes = original_processes[:]
-
-        self.manage_day(_sorted_processes)
-        self.set_text('获取表格信息，生成调度序列，并显示')
+        # 不用再按到达时间排序，run_table 会按到达时间把顾客送进店；在后台线程跑表格的副本，跑的时候可以继续编辑
+        self.queue_sim(self.table_customers().copy(), '获取表格信息，生成调度序列，并显示')
+
+    # 排队模拟：前一个跑完再跑下一个，界面不等
+    def queue_sim(self, customers, text):
+        self._runs.append((customers, text))
+        if self._worker is None:
+            self._next_sim()
+        else:
+            self.set_text('已加入队列，前面还有%d个模拟' % len(self._runs))
+
+    def _next_sim(self):
+        if not self._runs:
+            self._worker = None
+            self.btn_cancel.setEnabled(False)
+            return
+        customers, self._worker_text = self._runs.popleft()
+        self.log.t_start = self.T_START
+        self._worker_log = len(self.log)
+        stats = shopsim.PhaseStats() if self.stats_box.isChecked() else None
+        self._worker = SimulationThread(customers, list(self._SHIFT_1), self.NUM_WAITING, self.T_START, self.T_END,
+                                        stats, self)
+        ## Slots are ui methods so the worker's signals are queued over to the GUI thread
+        self._worker.logged.connect(self._sim_logged)
+        self._worker.progress.connect(self._sim_progress)
+        self._worker.done.connect(self._sim_done)
+        self._worker.finished.connect(self._worker.deleteLater)
+        self.btn_cancel.setEnabled(True)
+        self._worker.start()
+
+    def _sim_logged(self, events):
+        self.log.extend(events)  # 调度信息 picks them up on its next refresh
+
+    def _sim_progress(self, minute, day):
+        self.set_text('模拟中 %s（%d%%），排队%d个' % (clock(self._worker.t_start + minute), 100 * minute // day,
+                                                  len(self._runs)))
+
+    def _sim_done(self, customers, stats, cancelled):
+        self.log_model.refresh()
+        if cancelled:
+            self.set_text('模拟已取消')
+        else:
+            self.customers = customers
+            self.day = self._worker.day
+            self._day_log = self._worker_log
+            table = self.table_customers()
+            if self.day is not None:
+                self.day.report = None  # 线程用的进度回调，之后的增量重算在界面线程里跑
+                ## 跑的时候表格又被改过，检查点就不是这张表的了
+                if (self.day.table.arrive, self.day.table.serve, self.day.table.number, self.day.table.name_id) != (
+                        table.arrive, table.serve, table.number, table.name_id):
+                    self.day = None
+            text = self._worker_text
+            self.set_text(text if stats is None else text + '，各阶段耗时：' + stats.text())
+        self._worker.wait()
+        self._next_sim()
+
+    # 取消正在跑的模拟，排队的也不跑了
+    def cancel_sim(self):
+        self._runs.clear()
+        if self._worker is not None:
+            self._worker.cancel()
+
+    def closeEvent(self, event):
+        self.cancel_sim()
+        if self._worker is not None:
+            self._worker.wait()
+        super(ui, self).closeEvent(event)
+
+    # 表格里的顾客，按列存放（CustomerTable），每位顾客只占几十个字节，进店时才生成 Customer 对象
+    def table_customers(self):
+        return self.customer_model.table
+
+    # 从CSV导入顾客（id,name,arrival,service），放进表格并直接模拟
+    def import_csv(self):
+        path, _ = QFileDialog.getOpenFileName(self, '导入顾客', '', 'CSV (*.csv)')
+        if not path:
+            return
+        try:
+            customers = read_csv(path)
+        except (ScheduleError, OSError, UnicodeDecodeError) as e:
+            message_dialog("导入失败", str(e))
+            return
+        self.customer_model.set_table(customers)
+        if len(customers):
+            self.id = max(customers.number) + 1
+        self.queue_sim(customers.copy(), '导入%d位顾客并模拟' % len(customers))
+
+    # 导出上一次模拟的顾客和结果；还没模拟过就导出表格里的顾客
+    def export_csv(self):
+        path, _ = QFileDialog.getSaveFileName(self, '导出顾客', 'customers.csv', 'CSV (*.csv)')
+        if not path:
+            return
+        customers = self.customers if self.customers is not None else self.table_customers()
+        try:
+            write_csv(customers, path, outcome=self.customers is not None)
+        except OSError as e:
+            message_dialog("导出失败", str(e))
+            return
+        self.set_text('导出%d位顾客到%s' % (len(customers), path))
 
     # 设置字体
     def set_text(self, txt):
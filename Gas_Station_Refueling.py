@@ -88,16 +88,21 @@ def car_generator(env, gas_station, fuel_pump):
         env.process(car('Car %d' % i, env, gas_station, fuel_pump))
 
 
-# Setup and start the simulation
-print('Gas Station refuelling')
-random.seed(RANDOM_SEED)
-
-# Create environment and start processes
-env = simpy.Environment()
-gas_station = simpy.Resource(env, 2)
-fuel_pump = simpy.Container(env, GAS_STATION_SIZE, init=GAS_STATION_SIZE)
-env.process(gas_station_control(env, fuel_pump))
-env.process(car_generator(env, gas_station, fuel_pump))
-
-# Execute!
-env.run(until=SIM_TIME)
+def main(sim_time=SIM_TIME, seed=RANDOM_SEED):
+    # Setup and start the simulation
+    print('Gas Station refuelling')
+    random.seed(seed)
+
+    # Create environment and start processes
+    env = simpy.Environment()
+    gas_station = simpy.Resource(env, 2)
+    fuel_pump = simpy.Container(env, GAS_STATION_SIZE, init=GAS_STATION_SIZE)
+    env.process(gas_station_control(env, fuel_pump))
+    env.process(car_generator(env, gas_station, fuel_pump))
+
+    # Execute!
+    env.run(until=sim_time)
+
+
+if __name__ == '__main__':
+    main()
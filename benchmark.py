@@ -0,0 +1,216 @@
+"""
+Benchmarks for every simulation engine in the repo
+General Approach:
+    * A case is (customers, K, L, day length); every engine runs every case it can, with its output thrown away
+    * Engines: BarberShop.manage_day (walk-ins), shopsim.manage_day (barbers all day), shopsim.batch
+      (NumPy), the simpy models in sim_barbershop.py and Gas_Station_Refueling.py. Missing optional
+      dependencies (simpy, numpy) skip those engines instead of failing
+    * Results go to a JSON file; --compare holds them against a saved baseline and exits 1 on regressions
+
+    python benchmark.py -o bench.json                       # up to 100k customers
+    python benchmark.py --max-customers 1000000 -o full.json
+    python benchmark.py --compare bench.json                # run again, diff against bench.json
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import argparse
+import contextlib
+import json
+import platform
+import random
+import sys
+import time
+
+import shopsim
+
+## (customers, barbers, seats, day minutes); days are long enough for a customer a minute at most
+_SIZES = [(n, 2, 5, max(480, n)) for n in (10, 100, 1000, 10000, 100000, 1000000)]
+_BARBERS = [(10000, k, 5, 10000) for k in (1, 4, 16)]
+_SEATS = [(10000, 2, l, 10000) for l in (1, 15, 100)]
+_DAYS = [(1000, 2, 5, day) for day in (480, 4800, 48000)]
+CASES = sorted(set(_SIZES + _BARBERS + _SEATS + _DAYS))
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class _Sink(object):
+    """stdout for engines that print every event"""
+
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+##############################################################################
+#                                   Engines
+# ----------*----------*----------*----------*----------*----------*----------*
+## Each takes a case and returns a function that runs it once (setup stays out of the timing)
+def legacy_shop(customers, barbers, seats, day):
+    """BarberShop.py: a walk-in every few minutes, shift_2 relieving shift_1 halfway through"""
+    import BarberShop
+    every = max(1, day // customers)
+
+    def run():
+        BarberShop._SHIFT_1 = ["Barber-{}".format(i) for i in range(barbers)]
+        BarberShop._SHIFT_2 = ["Relief-{}".format(i) for i in range(barbers)]
+        BarberShop._MAX_CUSTOMERS = seats
+        BarberShop._CUSTOMER_FREQ = every
+        BarberShop._SHIFT_LEN = day // 2
+        BarberShop._CLOSING_TIME = BarberShop._OPEN_TIME + day
+        random.seed(42)
+        BarberShop.manage_day()
+    return run
+
+
+def headless_shop(customers, barbers, seats, day):
+    """shopsim.manage_day's event engine on Customer objects: Poisson customers with 30 minutes' patience,
+    barbers all day (shift_len, last_entry and kick_out None). Not the GUI's settings: 启动模拟 runs
+    run_table / IncrementalDay with the legacy 4 hour shifts and last entry"""
+    rng = random.Random(42)
+    arrivals = list(shopsim.poisson_customers(customers * 60.0 / day, 0, day, rng))
+
+    def run():
+        for customer in arrivals:
+            customer.status, customer.wait_time = "Waiting", 0
+        shopsim.manage_day(arrivals, [str(i) for i in range(barbers)], seats, 0, day,
+                           shift_len=None, last_entry=None, kick_out=None)
+    return run
+
+
+def batch_shop(customers, barbers, seats, day):
+    """shopsim.batch, 100 days at once (timed per day): the same barbers-all-day shop as headless_shop, but
+    customers that wait forever and random_days() arrivals squeezed into the day, so the days differ"""
+    from shopsim import batch
+    arrivals, serve = batch.random_days(100, customers, 0, day, 42)
+    arrivals = (arrivals * day // max(1, int(arrivals[:, -1].max()))).clip(0, day - 1)
+
+    def run():
+        batch.simulate(arrivals, serve, barbers, seats, day)
+    run.days = 100
+    return run
+
+
+def simpy_shop(customers, barbers, seats, day):
+    """sim_barbershop.py: a guest every T_INTER +- 2 minutes, CUT_TIME cuts. It has no waiting room limit,
+    and gaps can't go below 3 minutes, so the biggest cases see about a third of the customers asked for"""
+    import simpy
+    import sim_barbershop
+    if seats != 5:
+        return None  # L doesn't apply
+    t_inter = max(3, day // customers)
+
+    def run():
+        random.seed(42)
+        env = simpy.Environment()
+        env.process(sim_barbershop.setup(env, barbers, sim_barbershop.CUT_TIME, t_inter))
+        env.run(until=day)
+    return run
+
+
+def gas_station(customers, barbers, seats, day):
+    """Gas_Station_Refueling.py: a car every 30-300 seconds, 2 pumps (K, L and day length don't apply)"""
+    import Gas_Station_Refueling
+    if (barbers, seats) != (2, 5) or day != max(480, customers):
+        return None  # Only the customer-count sweep means anything here
+    sim_time = customers * 165  # Seconds, the mean gap between cars
+
+    def run():
+        Gas_Station_Refueling.main(sim_time)
+    return run
+
+
+ENGINES = [("BarberShop.manage_day", legacy_shop), ("shopsim.manage_day", headless_shop),
+           ("shopsim.batch", batch_shop), ("sim_barbershop", simpy_shop),
+           ("Gas_Station_Refueling", gas_station)]
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def measure(run, repeat):
+    """Best of `repeat` runs, in seconds (per day for batch engines)"""
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(_Sink()):
+            start = time.perf_counter()
+            run()
+            took = time.perf_counter() - start
+        best = took if best is None else min(best, took)
+    return best / getattr(run, "days", 1)
+
+
+def run_suite(max_customers=100000, engines=None, repeat=3, log=sys.stderr):
+    results = []
+    for name, make in ENGINES:
+        if engines and name not in engines:
+            continue
+        for customers, barbers, seats, day in CASES:
+            if customers > max_customers:
+                continue
+            case = {"engine": name, "customers": customers, "barbers": barbers, "seats": seats, "day": day}
+            try:
+                run = make(customers, barbers, seats, day)
+            except ImportError as e:
+                log.write("{}: skipped ({})\n".format(name, e))
+                break
+            if run is None:
+                continue
+            ## Big cases once, they take long enough to time on their own
+            case["seconds"] = measure(run, repeat if customers <= 10000 else 1)
+            case["us_per_customer"] = case["seconds"] * 1e6 / customers
+            log.write("{engine:<22} n={customers:<8} K={barbers:<3} L={seats:<4} day={day:<8} "
+                      "{seconds:10.4f} s\n".format(**case))
+            results.append(case)
+    return {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+
+
+def compare(current, baseline, tolerance=0.10):
+    """Lines comparing `current` with `baseline` results, and whether anything got slower than `tolerance`
+    """
+    key = lambda r: (r["engine"], r["customers"], r["barbers"], r["seats"], r["day"])
+    before = {key(r): r["seconds"] for r in baseline["results"]}
+    lines, slower = [], False
+    for r in current["results"]:
+        old = before.get(key(r))
+        if old is None:
+            continue
+        ratio = r["seconds"] / old if old else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag, slower = "  SLOWER", True
+        elif ratio < 1 - tolerance:
+            flag = "  faster"
+        lines.append("{:<22} n={:<8} K={:<3} L={:<4} day={:<8} {:10.4f} -> {:10.4f} s  x{:.2f}{}".format(
+            r["engine"], r["customers"], r["barbers"], r["seats"], r["day"], old, r["seconds"], ratio, flag))
+    return lines, slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation engines")
+    parser.add_argument("-o", "--output", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare with results saved earlier")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="slowdown that counts as a regression")
+    parser.add_argument("--max-customers", type=int, default=100000, help="largest case to run (up to 1000000)")
+    parser.add_argument("--engine", action="append", help="only this engine (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the best one counts")
+    args = parser.parse_args(argv)
+
+    current = run_suite(args.max_customers, args.engine, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            lines, slower = compare(current, json.load(f), args.tolerance)
+        print("\n".join(lines))
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
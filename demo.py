@@ -1,10 +1,23 @@
 import sys
 import random
-from time import sleep
+import struct
+import time
 
 from PySide2 import QtCore, QtWidgets, QtGui
+import multiprocessing
 from multiprocessing import Process
 
+try:
+    from multiprocessing import shared_memory  # Python 3.8+
+except ImportError:
+    shared_memory = None
+
+import shopsim
+from shopsim.playback import Playback, SPEEDS
+
+FRAME = 16  # 刷新间隔（毫秒），约等于显示器一帧
+SPEED_NAMES = ["1×", "10×", "1000×", "最快"]  # 与SPEEDS一一对应：每秒走过的营业分钟数
+
 
 # 循环队列
 class Queue:
@@ -57,6 +70,153 @@ class Queue:
         return self.queue[self.front]
 
 
+# 共享内存中的循环队列：一个生产者进程，多个消费者（理发师）进程
+class SharedQueue:
+    """
+    与Queue相同的循环队列和状态码，但存放在multiprocessing.shared_memory里，各进程看到的是同一个队列。
+    每个顾客是定长记录[编号, 到达时间, 剪发时间]（3个int，12字节），None（结束标记）记作编号-1。
+    下标更新：
+        空位和顾客数各用一个信号量计数（Linux上是futex，不用等时不进内核）；
+        只有一个生产者，队尾由它独占，不加锁；多个消费者抢队头，用一把锁保护。
+    put/pop默认不等待，返回Queue的状态码；block=True时等到有空位/有顾客为止。get()同pop(block=True)，
+    和multiprocessing.Queue的用法一样。
+    """
+    RECORD = struct.Struct("iii")
+    HEADER = struct.Struct("qq")  # 队头, 队尾
+
+    def __init__(self, max_size):
+        if shared_memory is None:
+            raise RuntimeError("SharedQueue需要Python 3.8及以上（multiprocessing.shared_memory）")
+        if max_size < 1:  # 没有空位，生产者第一次put(block=True)就会一直等下去
+            raise ValueError("SharedQueue的容量至少为1，给的是{}".format(max_size))
+        self.max_size = max_size + 1  # 容量 循环队列需要空出一个位置
+        self.shm = shared_memory.SharedMemory(create=True, size=self.HEADER.size + self.RECORD.size * self.max_size)
+        self.HEADER.pack_into(self.shm.buf, 0, 0, 0)
+        self.items = multiprocessing.Semaphore(0)  # 队列里的顾客数
+        self.spaces = multiprocessing.Semaphore(max_size)  # 空位数
+        self.head_lock = multiprocessing.Lock()  # 消费者之间抢队头
+
+    def __getstate__(self):
+        # 子进程按名字重新连上同一块共享内存
+        state = dict(self.__dict__)
+        state["shm"] = self.shm.name
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.shm = shared_memory.SharedMemory(name=state["shm"])
+
+    def _index(self):
+        return self.HEADER.unpack_from(self.shm.buf, 0)
+
+    # 队列长度
+    def size(self):
+        front, rear = self._index()
+        return (rear - front + self.max_size) % self.max_size
+
+    # 判断是否为空
+    def is_empty(self):
+        front, rear = self._index()
+        return rear == front
+
+    # 判断是否满
+    def is_full(self):
+        front, rear = self._index()
+        return (rear + 1) % self.max_size == front
+
+    # 添加元素（只能有一个生产者）
+    def put(self, item, block=False):
+        if not self.spaces.acquire(block):
+            return -1
+        front, rear = self._index()
+        self.RECORD.pack_into(self.shm.buf, self.HEADER.size + rear * self.RECORD.size,
+                              *(item if item is not None else (-1, 0, 0)))
+        struct.pack_into("q", self.shm.buf, 8, (rear + 1) % self.max_size)
+        self.items.release()
+        return 0
+
+    # 删除元素
+    def pop(self, block=False):
+        if not self.items.acquire(block):
+            return 1  # 队列空了
+        with self.head_lock:
+            front, _ = self._index()
+            item = self.RECORD.unpack_from(self.shm.buf, self.HEADER.size + front * self.RECORD.size)
+            struct.pack_into("q", self.shm.buf, 0, (front + 1) % self.max_size)
+        self.spaces.release()
+        return list(item) if item[0] != -1 else None
+
+    def get(self):
+        return self.pop(block=True)
+
+    # 查看队头元素
+    def get_item(self):
+        with self.head_lock:
+            front, rear = self._index()
+            if rear == front:
+                return 1
+            return list(self.RECORD.unpack_from(self.shm.buf, self.HEADER.size + front * self.RECORD.size))
+
+    # 用完后由创建者释放共享内存
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+# 生产者进程：随机生成count个顾客放进队列，最后给每个理发师一个结束标记
+def produce(queue, count, t_start, t_end, barbers):
+    for no in range(count):
+        t_arv_i = random.randint(t_start, t_end - 1)  # 到达时间在开店期间
+        t_cut_i = random.randint(5, 30)  # 剪发时间, 假设在5-30的一个随机数
+        queue.put([no, t_arv_i, t_cut_i], True)
+    for _ in range(barbers):
+        queue.put(None, True)
+
+
+# 理发师进程：不停地从队列取顾客，取到结束标记就下班；served累计接待人数
+def barber(queue, served):
+    count = 0
+    while True:
+        guest = queue.get()
+        if guest is None:
+            break
+        count += 1
+    with served.get_lock():
+        served.value += count
+
+
+# 一个生产者、K个理发师进程通过queue交接count个顾客，返回每秒交接数
+def handoff_rate(queue, count, barbers, t_start=0, t_end=480):
+    served = multiprocessing.Value("l", 0)
+    workers = [Process(target=barber, args=(queue, served)) for _ in range(barbers)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    producer = Process(target=produce, args=(queue, count, t_start, t_end, barbers))
+    producer.start()
+    producer.join()
+    for worker in workers:
+        worker.join()
+    seconds = time.perf_counter() - start
+    if served.value != count:
+        raise RuntimeError("交接了{}个顾客，应为{}个".format(served.value, count))
+    return count / seconds
+
+
+# 对比共享内存队列和multiprocessing.Queue
+def compare_queues(count=100000, barbers=4, size=10):
+    shared = SharedQueue(size)
+    try:
+        shared_rate = handoff_rate(shared, count, barbers)
+    finally:
+        shared.close()
+    plain_rate = handoff_rate(multiprocessing.Queue(size), count, barbers)
+    print("{}个顾客，{}个理发师，等待容量{}".format(count, barbers, size))
+    print("SharedQueue:           {:>10.0f} 次交接/秒".format(shared_rate))
+    print("multiprocessing.Queue: {:>10.0f} 次交接/秒".format(plain_rate))
+    return shared_rate, plain_rate
+
+
 # 消息提示
 def message_dialog(type, msg):
     msg_box = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Warning, type, msg)
@@ -76,9 +236,19 @@ class MyWidget(QtWidgets.QWidget):
         self.current_time = 0  # 当前开始时间
         self.no = 0  # 顾客编号
         self.notice = []  # 顾客处理结果的数组，保存每一个顾客i的处理结果信息
-        self.timer = QtCore.QTimer()  # 全局计数器
+        self.timer = QtCore.QTimer()  # 全局计数器，每帧触发一次
+        self.timer.setInterval(FRAME)
+        self.clock = QtCore.QElapsedTimer()  # 两帧之间实际经过的时间
         self.lcd = QtWidgets.QLCDNumber()
         self.num = 0
+        self.playback = None  # 预先算好的一天，按所选速度放映
+        self.guests = {}  # 顾客名 -> (编号, 到达时间, 理发时间)，用于填写等待队列表格
+
+        self.speedBox = QtWidgets.QComboBox()
+        self.speedBox.addItems(SPEED_NAMES)
+        self.idleBox = QtWidgets.QCheckBox("跳过空闲")
+        self.idleBox.setChecked(True)
+        self.notice_model = QtCore.QStringListModel()
 
         self.barberEdit = QtWidgets.QLineEdit()
         self.waitEdit = QtWidgets.QLineEdit()
@@ -90,14 +260,38 @@ class MyWidget(QtWidgets.QWidget):
 
         self.initUi()
 
-    # 计时器
+    # 计时器：放映这一帧内到期的所有事件，LCD、表格和通告每帧只刷新一次
     def show_timer(self):
+        events = self.playback.advance(self.clock.restart() / 1000.0)
+        self.num = self.t_start + int(self.playback.minute)
         self.lcd.display(self.num)
-        sleep(1)
-        if self.num == self.t_end:
-            self.num = 0
+        if events:
+            rows = self.notice_model.rowCount()
+            self.notice_model.insertRows(rows, len(events))
+            for i, event in enumerate(events):
+                self.notice.append(event[3])
+                self.notice_model.setData(self.notice_model.index(rows + i), event[3])
+            self.show_waiting()
+        if self.playback.done():
             self.timer.stop()
-        self.num = self.num + 1
+
+    # 等待队列表格：编号、到达时间、理发时间
+    def show_waiting(self):
+        waiting = self.playback.waiting
+        self.table.clearContents()
+        self.table.setRowCount(max(8, len(waiting)))
+        for row, name in enumerate(waiting):
+            for column, value in enumerate(self.guests[name]):
+                self.table.setItem(row, column, QtWidgets.QTableWidgetItem(str(value)))
+
+    # 放映速度和是否跳过空闲，放映途中也可以改
+    def set_speed(self, index):
+        if self.playback is not None:
+            self.playback.speed = SPEEDS[index]
+
+    def set_skip_idle(self, checked):
+        if self.playback is not None:
+            self.playback.skip_idle = checked
 
     # 初始化界面
     def initUi(self):
@@ -135,15 +329,22 @@ class MyWidget(QtWidgets.QWidget):
         addButton = QtWidgets.QPushButton("添加顾客")
         grid.addWidget(addButton, 2, 2)
 
+        grid.addWidget(QtWidgets.QLabel("放映速度："), 2, 3)
+        grid.addWidget(self.speedBox, 2, 4)
+        grid.addWidget(self.idleBox, 2, 5)
+
         wait_list = QtWidgets.QLabel("等待队列：")
         self.table.setColumnCount(3)
         self.table.setRowCount(8)
+        self.table.setHorizontalHeaderLabels(["编号", "到达时间", "理发时间"])
 
         grid.addWidget(wait_list, 3, 0)
         grid.addWidget(self.table, 4, 0)
 
         res = QtWidgets.QLabel("理发通告：")
         resEdit = QtWidgets.QListView()
+        resEdit.setModel(self.notice_model)
+        resEdit.setUniformItemSizes(True)
 
         grid.addWidget(res, 3, 3)
         grid.addWidget(resEdit, 4, 5)
@@ -154,6 +355,8 @@ class MyWidget(QtWidgets.QWidget):
         # 触发事件
         addButton.clicked.connect(self.producer)
         self.timer.timeout.connect(self.show_timer)
+        self.speedBox.currentIndexChanged.connect(self.set_speed)
+        self.idleBox.toggled.connect(self.set_skip_idle)
 
     # 初始化数据
     def get_data(self):
@@ -174,27 +377,41 @@ class MyWidget(QtWidgets.QWidget):
             return False
 
     def init(self):
-        if self.get_data():
-            if self.K <= 0:
-                message_dialog("参数错误", '理发师人数必须大于0！')
-                self.timer.stop()
-            if self.L < 0:
-                message_dialog("参数错误", "等待容量不能小于0！")
-                self.timer.stop()
-            if self.t_start < 0:
-                message_dialog("参数错误", "开店时间不能小于0！")
-                self.timer.stop()
-            if self.t_end < 0:
-                message_dialog("参数错误", "关店时间不能小于0！")
-                self.timer.stop()
-            if self.t_start >= self.t_end:
-                message_dialog("参数错误", "开店时间必须小于关店时间！")
-                self.timer.stop()
-            # 启动定时器
-            self.timer.start()
-        else:
+        self.timer.stop()
+        if not self.get_data():
             message_dialog("参数错误", "初始参数不能为空！")
-            self.timer.stop()
+            return
+        if self.K <= 0:
+            message_dialog("参数错误", '理发师人数必须大于0！')
+        elif self.L < 0:
+            message_dialog("参数错误", "等待容量不能小于0！")
+        elif self.t_start < 0:
+            message_dialog("参数错误", "开店时间不能小于0！")
+        elif self.t_end < 0:
+            message_dialog("参数错误", "关店时间不能小于0！")
+        elif self.t_start >= self.t_end:
+            message_dialog("参数错误", "开店时间必须小于关店时间！")
+        else:
+            self.start_playback()
+
+    # 先把一整天模拟完（毫秒级），再按所选速度放映，空闲时段直接跳过
+    def start_playback(self, guests=None):
+        day = self.t_end - self.t_start
+        if guests is None:
+            guests = list(shopsim.random_customers(day, self.t_start, self.t_end))
+        # Customer只把编号放在名字"Customer-<n>:<name>"里
+        self.guests = dict((guest.name, (int(guest.name.split(":", 1)[0].rpartition("-")[2]), guest.arrive_time,
+                                         guest.serve_time)) for guest in guests)
+        log = shopsim.EventLog(self.t_start)
+        shopsim.manage_day(guests, ["理发师{}".format(i + 1) for i in range(self.K)], self.L,
+                           self.t_start, self.t_end, log, shift_len=day, last_entry=day, kick_out=day)
+        self.playback = Playback(log, day, SPEEDS[self.speedBox.currentIndex()], self.idleBox.isChecked())
+        self.notice = []
+        self.notice_model.setStringList([])
+        self.table.clearContents()
+        # 启动定时器
+        self.clock.start()
+        self.timer.start()
 
     # 随机生成顾客--生产者方法
     def producer(self):
@@ -212,16 +429,55 @@ class MyWidget(QtWidgets.QWidget):
             current_guest = self.queue.get_item()
             print("消费者：", current_guest)
 
-    def controller(self):
-        # 启动进程
-        p = Process(target=self.producer)
-        c = Process(target=self.consumer)
-        p.start()
-        c.start()
-
-
-# 运行窗口
+    def controller(self, count=100):
+        # 启动进程：一个生产者、K个理发师进程共用一个共享内存队列，返回每秒交接数
+        # L=0（没有等候位）时也留一个位置交接，和shopsim.live的长凳一样
+        queue = SharedQueue(max(self.L, 1))
+        try:
+            return handoff_rate(queue, count, self.K, self.t_start, self.t_end)
+        finally:
+            queue.close()
+
+
+# 不显示窗口，按最快速度放映几帧，检查LCD、通告和等待队列表格都跟得上；有问题抛AssertionError
+def check_playback(frames=50):
+    import os
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    widget = MyWidget()
+    widget.barberEdit.setText("1")
+    widget.waitEdit.setText("3")
+    widget.startEdit.setText("540")
+    widget.endEdit.setText("1020")
+    widget.speedBox.setCurrentIndex(SPEEDS.index(None))
+    widget.get_data()
+    # 开门就来一拨人，每2分钟一个、各剪20分钟，一定有人排队
+    widget.start_playback([shopsim.Customer(number + 1, "Guest", 540 + 2 * number, 20) for number in range(12)])
+    widget.timer.stop()  # 帧由这里一帧一帧地走，不等计时器
+    widget.playback.burst = 4  # 每帧只放几个事件，中途的等待队列才看得到
+    busiest = 0
+    for _ in range(frames):
+        widget.show_timer()
+        waiting = widget.playback.waiting
+        assert widget.notice_model.rowCount() == widget.playback.pos
+        for row, name in enumerate(waiting):
+            assert name.startswith("Customer-{}:".format(widget.table.item(row, 0).text())), name
+        busiest = max(busiest, len(waiting))
+        if widget.playback.done():
+            break
+    assert widget.playback.pos > 0 and busiest > 0, "放映了{}个事件，最多{}人等待".format(widget.playback.pos, busiest)
+    print("放映{}个事件，最多{}人等待，LCD {}".format(widget.playback.pos, busiest, widget.lcd.value()))
+    app.processEvents()
+
+
+# 运行窗口；python demo.py --handoff [顾客数 [理发师数]] 对比两种进程间队列；python demo.py --check 无窗口检查放映
 if __name__ == '__main__':
+    if sys.argv[1:2] == ["--handoff"]:
+        compare_queues(*[int(arg) for arg in sys.argv[2:4]])
+        sys.exit(0)
+    if sys.argv[1:2] == ["--check"]:
+        check_playback()
+        sys.exit(0)
     app = QtWidgets.QApplication([])
     app.setApplicationName("理发店模拟")
     widget = MyWidget()
@@ -0,0 +1,17 @@
+"""
+Headless barber shop simulation
+The model and the engine that runs it, with nothing from Qt, Faker or simpy, so it can be imported
+(and run, see `python -m shopsim`) by scripts, batch jobs and the GUI alike
+"""
+
+from .engine import (Manager, describe, fixed_patience, uniform_patience, exponential_patience,
+                     OPENED, CLOSED, SHIFT_STARTED, ENTERED, TOO_LATE, BALKED, RENEGED, TURNED_OUT,
+                     CUT_STARTED, CUT_ENDED, SERVED, SHIFT_ENDED)
+from .shop import (Customer, WaitingArea, Barber, clock, unclock, open_shop, manage_day, random_customers,
+                   poisson_customers)
+from .log import EventLog
+from .trace import Trace, TraceWriter
+from .instrument import PhaseStats
+from .table import CustomerTable, run_table
+from .incremental import IncrementalDay
+from .montecarlo import DayConfig, DaySummary, Estimates, replicate, run_day
@@ -0,0 +1,105 @@
+"""
+Run a barber shop day without the GUI
+
+    python -m shopsim -k 3 -l 5 --open 09:00 --close 17:00 -n 40
+    python -m shopsim -q -n 2000 --close 23:59 --stats     # where the engine spends its time
+    python -m shopsim --schedule day.csv --export result.csv  # customers from / outcomes to CSV
+    python -m shopsim --live 0.05                             # played out live, 0.05 s a shop minute
+"""
+
+import argparse
+import random
+
+from . import describe, clock, unclock, random_customers, SERVED
+from .montecarlo import DayConfig, Estimates, METRICS, replicate
+from .instrument import PhaseStats
+from .live import run_live
+from .schedule import ScheduleError, read_csv, write_csv
+from .table import CustomerTable, TableRecorder, run_table
+from .trace import TraceWriter
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="shopsim", description="Simulate a barber shop day, headless")
+    parser.add_argument("-k", "--barbers", type=int, default=2, help="number of barbers")
+    parser.add_argument("-l", "--seats", type=int, default=5, help="waiting area seats")
+    parser.add_argument("--open", default="09:00", help="opening time, HH:MM")
+    parser.add_argument("--close", default="17:00", help="closing time, HH:MM")
+    parser.add_argument("-n", "--customers", type=int, default=20, help="random customers to send in")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    parser.add_argument("--schedule", metavar="CSV", help="customers from this CSV (id,name,arrival,service) "
+                                                          "instead of -n random ones")
+    parser.add_argument("--export", metavar="CSV", help="write the customers and how they fared to this CSV")
+    parser.add_argument("--trace", metavar="PATH", help="also write a binary event trace (see shopsim.trace)")
+    parser.add_argument("--stats", action="store_true",
+                        help="time the engine's phases and print them as JSON at the end")
+    parser.add_argument("--live", type=float, metavar="SECONDS",
+                        help="play the day out live (asyncio), SECONDS real seconds a shop minute")
+    parser.add_argument("-r", "--replications", type=int, default=0,
+                        help="run this many independent days instead and summarize them")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="processes for --replications (all cores)")
+    args = parser.parse_args(argv)
+
+    t_start, t_end = unclock(args.open), unclock(args.close)
+    if args.barbers <= 0 or args.seats < 0 or t_end <= t_start:
+        parser.error("need at least one barber, no negative seats and opening before closing")
+    if args.live is not None and (args.live <= 0 or args.stats):
+        parser.error("--live needs a positive number of seconds and has no --stats")
+    if args.replications:
+        return _replications(args, t_start, t_end)
+
+    if args.schedule:
+        try:
+            customers = read_csv(args.schedule)
+        except ScheduleError as e:
+            parser.exit(1, "{}: {}\n".format(args.schedule, e))
+    else:
+        customers = CustomerTable().extend(random_customers(args.customers, t_start, t_end,
+                                                            random.Random(args.seed)))
+    served = []
+    trace = TraceWriter(args.trace, t_start) if args.trace else None
+
+    def report(minute, kind, subject):
+        if kind == SERVED:
+            served.append(subject)
+        if trace is not None:
+            trace(minute, kind, subject)
+        if not args.quiet:
+            print(describe(kind, subject, clock(t_start + minute)))
+
+    barbers = ["Barber-{}".format(i + 1) for i in range(args.barbers)]
+    stats = PhaseStats() if args.stats else None
+    if args.live is not None:
+        run_live((customers.customer(i) for i in customers.order()), barbers, args.seats, t_start, t_end,
+                 TableRecorder(customers, t_start, report), args.live)
+    else:
+        run_table(customers, barbers, args.seats, t_start, t_end, report, stats=stats)
+    if trace is not None:
+        trace.close()
+    if args.export:
+        write_csv(customers, args.export, outcome=True)
+
+    ## Total time is waiting plus the cut itself
+    total = sum(customer.wait_time + customer.serve_time for customer in served)
+    print("Served {} of {} customers, {:.1f} minutes on average".format(
+        len(served), len(customers), total / len(served) if served else 0.0))
+    if stats is not None:
+        print(stats.json())
+
+
+def _replications(args, t_start, t_end):
+    config = DayConfig(args.customers, args.barbers, args.seats, t_start, t_end)
+    estimates = Estimates()
+    for day in replicate(config, args.replications, args.seed, args.workers):
+        estimates.add(day)
+        if not args.quiet:
+            print("day {}: served {}, balked {}, reneged {}, {:.1f} minutes on average".format(
+                day.seed, day.served, day.balked, day.reneged, day.mean_time))
+    print("{} days, means with 95% confidence intervals:".format(estimates.n))
+    for metric in METRICS:
+        print("  {:<13} {}".format(metric, estimates[metric]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Arrival processes, as lazy streams
+General Approach:
+    * Each process is a generator of arrival times (minutes since midnight, floats, never decreasing)
+      from t_start on; t_end None keeps it going forever
+    * customers() turns times into Customers one at a time, and the Manager only pulls the next one when it
+      needs to know when it is (see engine.ArrivalCursor), so nothing is made ahead of time and an endless
+      stream runs a day of any length in constant memory
+    * profile() follows a rate that changes over the day by thinning: draw at the peak rate, keep each
+      arrival with probability rate(now) / peak
+    * merge() interleaves several streams, e.g. walk-ins plus a bus load at noon
+
+    times = merge(poisson(6), batches(1, (5, 10), unclock("12:00"), unclock("12:30")))
+    manage_day(customers(times), ["A", "B"], 5)
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import bisect
+import heapq
+import itertools
+import random
+
+from .shop import Customer, unclock, _OPEN_TIME, _CLOSING_TIME, _PATIENCE
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def poisson(rate, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, rng=random):
+    """`rate` arrivals an hour on average, exponential gaps
+    """
+    time = float(t_start)
+    while True:
+        time += rng.expovariate(rate / 60.0)
+        if t_end is not None and time >= t_end:
+            return
+        yield time
+
+
+def fixed(every, t_start=_OPEN_TIME, t_end=_CLOSING_TIME):
+    """An arrival every `every` minutes, the first one at t_start
+
+    Examples:
+    >>> list(fixed(20, 600, 660))
+    [600, 620, 640]
+    """
+    for time in itertools.count(t_start, every):
+        if t_end is not None and time >= t_end:
+            return
+        yield time
+
+
+def batches(rate, size, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, rng=random):
+    """Groups turning up together, `rate` groups an hour (Poisson); `size` people in each,
+    or between size[0] and size[1] of them
+    """
+    for time in poisson(rate, t_start, t_end, rng):
+        for _ in range(size if isinstance(size, int) else rng.randint(*size)):
+            yield time
+
+
+def profile(rates, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, rng=random, peak=None):
+    """Poisson arrivals whose rate (an hour) changes over the day: `rates` is a list of (minute, rate) steps,
+    each rate holding until the next step, or a function of the minute with its `peak` rate given
+
+    Examples:
+    >>> lunch = [(0, 2.0), (unclock("12:00"), 10.0), (unclock("13:00"), 2.0)]
+    >>> times = list(profile(lunch, rng=random.Random(1)))
+    >>> sum(1 for t in times if 720 <= t < 780) > sum(1 for t in times if 600 <= t < 660)
+    True
+    """
+    if callable(rates):
+        rate = rates
+        if peak is None:
+            raise ValueError("a rate function needs its peak rate")
+    else:
+        steps = sorted(rates)
+        minutes, values = [m for m, _ in steps], [r for _, r in steps]
+        peak = max(values) if peak is None else peak
+
+        def rate(time):
+            i = bisect.bisect_right(minutes, time) - 1
+            return values[i] if i >= 0 else 0.0
+    if peak <= 0:
+        return
+    for time in poisson(peak, t_start, t_end, rng):
+        if rng.random() * peak < rate(time):
+            yield time
+
+
+def merge(*streams):
+    """Arrival times of all `streams` in one stream, in order
+    """
+    return heapq.merge(*streams)
+
+
+def customers(times, rng=random, serve=(10, 30), patience=_PATIENCE, name="Guest {}"):
+    """A Customer for each arrival time (whole minutes), wanting a serve[0]-serve[1] minute cut
+    """
+    for number, time in enumerate(times):
+        yield Customer(number, name.format(number), int(time), rng.randint(*serve), patience)
+
@@ -0,0 +1,174 @@
+"""
+Vectorized batch engine: thousands of plain FIFO shop days at once (needs NumPy)
+General Approach:
+    * Only for the plain model: K barbers that work until closing (shift_len None), L seats,
+      customers that wait forever (patience None), fixed closing time
+    * A batch is R days side by side: arrivals and service times are R x N arrays, one row per day,
+      each row sorted by arrival (minutes since opening)
+    * Customers are handled one column at a time for all R days together. FIFO means the next customer is
+      seated as soon as any barber is free, by the lowest numbered free barber, so per day all we carry
+      is each barber's free-from minute and when the last L customers let go of their seat
+    * Outcomes are the same per customer as the Manager running Customer / WaitingArea / Barber objects
+      (see simulate(); `python -m shopsim.batch` checks that on random days)
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import collections
+
+import numpy as np
+
+## Per-customer outcome codes
+SERVED = 0  # Got their haircut and left satisfied
+IN_CHAIR = 1  # Still in the chair at closing time
+WAITING = 2  # Still waiting at closing time
+TURNED_OUT = 3  # Waiting area was cleared (kick_out)
+BALKED = 4  # Waiting area full
+TOO_LATE = 5  # Came at or after last_entry
+ABSENT = 6  # Came before opening or after closing, never seen
+
+## Customer.status the object model leaves behind for each outcome
+STATUSES = ("satisfied", "Waiting", "Waiting", "furious", "impatient", "cursing himself", "Waiting")
+
+Outcomes = collections.namedtuple("Outcomes", "status wait start end barber")
+Outcomes.__doc__ = """R x N arrays: outcome code, minutes waited (Customer.wait_time), minute seated and
+minute the cut ended (-1 if not seated), barber index in roster order (-1 if none)"""
+
+_NEVER = np.iinfo(np.int64).max // 2
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def simulate(arrivals, serve_times, barbers, seats, day, last_entry=None, kick_out=None):
+    """Run R days of `barbers` barbers and `seats` seats, open `day` minutes
+    `arrivals` and `serve_times` are R x N integer arrays, rows sorted by arrival; pad short days with
+    arrivals >= `day` (they never come). `last_entry` and `kick_out` work as for the Manager.
+    Returns Outcomes
+    """
+    arrivals = np.asarray(arrivals, dtype=np.int64)
+    serve_times = np.asarray(serve_times, dtype=np.int64)
+    if arrivals.ndim != 2 or arrivals.shape != serve_times.shape:
+        raise ValueError("arrivals and serve_times must be R x N arrays of the same shape")
+    if barbers < 1 or seats < 0:
+        raise ValueError("need at least one barber and no negative seats")
+    days, count = arrivals.shape
+    rows = np.arange(days)
+    ## Work a customer (column) at a time, so keep columns contiguous; transposed back at the end
+    arrivals, serve_times = np.ascontiguousarray(arrivals.T), np.ascontiguousarray(serve_times.T)
+
+    status = np.full((count, days), ABSENT, dtype=np.int8)
+    wait = np.zeros((count, days), dtype=np.int64)
+    start = np.full((count, days), -1, dtype=np.int64)
+    end = np.full((count, days), -1, dtype=np.int64)
+    chair = np.full((count, days), -1, dtype=np.int64)
+
+    free = np.zeros((days, barbers), dtype=np.int64)  # Minute each barber can take the next customer
+    ## Last minute each of the last `seats` admitted customers is in the waiting area, -1 once gone for good
+    leaves = np.full((days, max(seats, 1)), -1, dtype=np.int64)
+    admitted = np.zeros(days, dtype=np.int64)
+    never = np.full(days, _NEVER, dtype=np.int64)
+    nobody = np.zeros(days, dtype=bool)
+
+    for j in range(count):
+        arrive = arrivals[j]
+        if arrive.min() >= day:  # Rows are sorted, nobody else comes on any of the days
+            break
+        here = (arrive >= 0) & (arrive < day)
+        late = here & (arrive >= last_entry) if last_entry is not None else nobody
+        ## Full if the customer `seats` admissions back is still there when this one walks in
+        oldest = admitted % leaves.shape[1]
+        full = here & ~late & (leaves[rows, oldest] >= arrive if seats else here)
+        come_in = here & ~late & ~full
+
+        ## First free barber takes them; the lowest numbered one if several are free by then
+        seat = np.maximum(arrive, free.min(axis=1))
+        barber = np.argmax(free <= seat[:, None], axis=1)
+        turn_out = np.where(arrive > kick_out, arrive + 1, kick_out + 1) if kick_out is not None else never
+        seated = come_in & (seat < turn_out) & (seat < day)
+        done = seat + np.maximum(serve_times[j], 1)
+        cleared = come_in & ~seated & (turn_out < day)
+        stays = come_in & ~seated & ~cleared
+        free[rows[seated], barber[seated]] = done[seated]
+
+        code = status[j]
+        code[late] = TOO_LATE
+        code[full] = BALKED
+        code[seated] = np.where(done < day, SERVED, IN_CHAIR)[seated]
+        code[cleared] = TURNED_OUT
+        code[stays] = WAITING
+        wait[j] = np.where(seated, seat, np.where(cleared, turn_out, np.where(stays, np.maximum(day - 1, arrive),
+                                                                               arrive))) - arrive
+        np.copyto(start[j], seat, where=seated)
+        np.copyto(end[j], done, where=seated)
+        np.copyto(chair[j], barber, where=seated)
+
+        ## Seated customers stay in the waiting area up to the barber phase of their seat minute,
+        ## turned out ones are gone before anyone walks in that minute
+        leaving = np.where(seated, seat, np.where(cleared, turn_out - 1, _NEVER))
+        leaves[rows[come_in], oldest[come_in]] = leaving[come_in]
+        admitted += come_in
+
+    return Outcomes(status.T, wait.T, start.T, end.T, chair.T)
+
+
+def random_days(days, count, t_start, t_end, rng=None):
+    """`days` x `count` arrivals (minutes since opening) and service times drawn like random_customers():
+    each customer within an hour of the previous one, 10-30 minute cuts. Customers past closing time
+    land at or after `t_end - t_start` and never come
+    """
+    rng = np.random.default_rng(rng)
+    arrivals = np.cumsum(rng.integers(0, 61, size=(days, count)), axis=1)
+    return arrivals, rng.integers(10, 31, size=(days, count))
+
+
+def summarize(outcomes, serve_times):
+    """Per-day counts and mean total time (waiting plus cut) of the served customers, as R arrays
+    """
+    served = outcomes.status == SERVED
+    total = np.where(served, outcomes.wait + serve_times, 0)
+    n = served.sum(axis=1)
+    return {
+        "served": n,
+        "balked": ((outcomes.status == BALKED) | (outcomes.status == TOO_LATE)).sum(axis=1),
+        "turned_out": (outcomes.status == TURNED_OUT).sum(axis=1),
+        "mean_time": np.where(n > 0, total.sum(axis=1) / np.maximum(n, 1), 0.0),
+    }
+
+
+def _check(days=300, seed=0):
+    """Compare simulate() with the object model on random days, return the number of customers that differ
+    """
+    import random
+    from .engine import CUT_STARTED
+    from .shop import Customer, open_shop
+
+    r = random.Random(seed)
+    bad = 0
+    for _ in range(days):
+        k, l, day = r.randint(1, 4), r.choice([0, 1, 2, 5, 10]), r.choice([60, 120, 480])
+        last_entry = r.choice([None, day // 2, day - 5, day + 5])
+        kick_out = r.choice([None, day // 3, day // 2, day - 2])
+        n = r.choice([1, 5, 30, 80])
+        rows = sorted((r.randint(-5, day + 5), r.choice([0, 1, 2] + list(range(5, 45)))) for _ in range(n))
+        customers = [Customer(i, "c", a, s, patience=None) for i, (a, s) in enumerate(rows)]
+        chairs = {}
+
+        def report(minute, kind, subject):
+            if kind == CUT_STARTED:
+                chairs[subject.customer] = int(subject.name)
+
+        open_shop(customers, [str(i) for i in range(k)], l, 0, day, report, shift_len=None,
+                  last_entry=last_entry, kick_out=kick_out).run()
+        out = simulate([[a for a, _ in rows]], [[s for _, s in rows]], k, l, day, last_entry, kick_out)
+        for i, customer in enumerate(customers):
+            expected = (customer.status, customer.wait_time, chairs.get(customer, -1))
+            got = (STATUSES[out.status[0, i]], int(out.wait[0, i]), int(out.barber[0, i]))
+            if expected != got:
+                bad += 1
+    return bad
+
+
+if __name__ == "__main__":
+    print("customers that differ from the object model:", _check())
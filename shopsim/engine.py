@@ -0,0 +1,615 @@
+"""
+Next-event engine for the barber shop
+General Approach:
+    * Everything that will happen is an entry on an event calendar (a heap) keyed by (minute, phase, key)
+    * The clock jumps straight from one busy minute to the next instead of ticking every minute
+    * Within a minute the phases run in the order the old tick loop used:
+        0. impatient customers leave the waiting area
+        1. new customers come in
+        2. barbers (in roster order) finish a cut, take the next customer or go home
+    * Customers and barbers are only proceed()-ed when something is due for them, with all the minutes
+      that passed since they were last looked at, so the cost scales with events and not minutes x entities
+    * When waiting customers run out of patience is kept on a timing wheel (see timing_wheel), so seating
+      a customer cancels their deadline in O(1) and only the ones that really give up are looked at
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import bisect
+import heapq
+import random
+
+from .timing_wheel import TimingWheel
+
+## Calendar phases, in the order the old tick loop handled them within a minute
+SWEEP = 0  # Customers get turned out at closing time
+ARRIVE = 1  # New customers come in
+BARBER = 2  # Barbers finish, pick up the next customer or go home
+
+## What happened, handed to the report callback along with the customer or barber
+OPENED = "opened"
+CLOSED = "closed"
+SHIFT_STARTED = "shift started"
+ENTERED = "entered"
+TOO_LATE = "too late"
+BALKED = "balked"
+RENEGED = "reneged"
+TURNED_OUT = "turned out"
+CUT_STARTED = "cut started"
+CUT_ENDED = "cut ended"
+SERVED = "served"
+SHIFT_ENDED = "shift ended"
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class EventCalendar(object):
+    """Pending events, earliest first
+    Binary heap of (minute, phase, key, tie, payload); `tie` keeps equal keys in scheduling order
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._tie = 0  # Plain counters rather than itertools.count, so a calendar pickles (see fork)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, minute, phase, key, payload):
+        self._tie += 1
+        heapq.heappush(self._heap, (minute, phase, key, self._tie, payload))
+
+    def remove(self, phase):
+        """Drop every event of `phase` (a full pass over the calendar; for changing plans mid-day)
+        """
+        self._heap = [entry for entry in self._heap if entry[1] != phase]
+        heapq.heapify(self._heap)
+
+    def peek(self):
+        """(minute, phase, key, payload) of the earliest event, without removing it
+        """
+        minute, phase, key, _, payload = self._heap[0]
+        return minute, phase, key, payload
+
+    def pop(self):
+        """Remove and return (minute, phase, payload) of the earliest event
+        """
+        minute, phase, _, _, payload = heapq.heappop(self._heap)
+        return minute, phase, payload
+
+
+class ArrivalCursor(object):
+    """Arrivals sorted by minute, read one ahead, so each one is looked at exactly once
+    `arrivals` are (minute, customer) pairs, already in arrival order; any iterable will do, and a generator
+    is only ever pulled as far as the next arrival (see arrivals), so endless streams run in constant memory
+    """
+
+    def __init__(self, arrivals):
+        self._arrivals = iter(arrivals)
+        self._next = None  # (minute, customer) up next
+        self._pull()
+
+    def _pull(self):
+        last = self._next
+        self._next = next(self._arrivals, None)
+        if self._next is not None and last is not None and self._next[0] < last[0]:
+            raise ValueError("arrivals must be sorted by minute, {} came after {}".format(self._next[0], last[0]))
+
+    def seek(self, minute):
+        """Skip everyone arriving before `minute`
+        """
+        while self._next is not None and self._next[0] < minute:
+            self._pull()
+
+    def peek(self):
+        """Minute of the next arrival, None once everyone came in
+        """
+        if self._next is not None:
+            return self._next[0]
+        return None
+
+    def take(self, minute):
+        """Customers arriving at `minute`, in order
+        """
+        customers = []
+        while self._next is not None and self._next[0] == minute:
+            customers.append(self._next[1])
+            self._pull()
+        return customers
+
+
+class _WalkIns(object):
+    """A customer every `every` minutes, made on the spot by `make_customer()`"""
+
+    def __init__(self, every, make_customer):
+        self.every = every
+        self.make_customer = make_customer
+
+
+class _Patience(object):
+    """A patience drawer: `draw(rng, *args)` minutes each call
+    Pickles with its random source, unless that is the random module itself (whose state isn't its own)
+    """
+
+    def __init__(self, draw, rng, *args):
+        self.draw = draw
+        self.rng = rng
+        self.args = args
+
+    def __call__(self):
+        return self.draw(self.rng, *self.args)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if state["rng"] is random:
+            state["rng"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.rng is None and self.draw is not _fixed:
+            self.rng = random
+
+
+class Manager(object):
+    """Runs a shop day off an event calendar
+    Drives the shop's own Customer / WaitingArea / Barber objects, so their proceed(minutes), cut() and
+    add_customer() rules stay the source of truth; the manager only works out *when* to call them.
+
+    Every event is handed to `report(minute, kind, subject)`: the customer, or the barber for shift and cut
+    events (their customer is still on `barber.customer`), None for opening and closing.
+
+    until       minute the day ends at; None keeps the shop open past `last_entry` until every barber went home
+    closing     minute from which idle barbers go home (their own proceed() decides about shift length)
+    shift_len   minutes a barber works before going home once idle; a barber's own `shift_len` goes first
+    last_entry  minute from which arriving customers are sent away
+    kick_out    customers still waiting after this minute are turned out
+    relief      names of barbers waiting to take over (popped from the end), made with `make_barber(name)`
+    patience    draws a customer's patience (minutes) as they sit down, see fixed_patience() and friends;
+                None leaves each Customer's own patience alone
+    on_time     called with the minute whenever the clock moves, for whoever keeps the shop time
+    stats       a PhaseStats (see instrument) to time the phases with; None runs without any timing at all
+    """
+
+    def __init__(self, barbers, waiting_area, report, until=None, closing=None, shift_len=None,
+                 last_entry=None, kick_out=None, relief=None, make_barber=None, patience=None, on_time=None,
+                 stats=None):
+        self.barbers = list(barbers)
+        self.waiting_area = waiting_area
+        self.report = report
+        self.until = until
+        self.closing = closing
+        self.shift_len = shift_len
+        self.last_entry = last_entry
+        self.kick_out = kick_out
+        self.relief = relief if relief is not None else []
+        self.make_barber = make_barber
+        self.patience = patience
+        self.on_time = on_time
+
+        self.now = 0
+        self.calendar = EventCalendar()
+        self.arrivals = ArrivalCursor(())
+        self.deadlines = TimingWheel()  # Waiting customer -> minute they give up
+        self._walk_ins = 0  # Walk-in streams, in the order they were added
+        self._entries = 0  # Waiting area entry order
+        self._roster = 0  # Barber join order, i.e. roster order
+        self._seq = {}  # Barber -> roster position
+        self._entry = {}  # Waiting customer -> entry number
+        self._credited = {}  # Barber / waiting customer -> minute it has been proceed()-ed up to
+        self._due = {}  # Barber -> minute of its one live calendar entry
+        self._parked = {}  # Barber -> minute of its going-home entry still on the calendar, live or not
+        self._idle = []  # Roster positions of idle barbers, sorted
+        self._idlers = {}  # Roster position -> idle barber
+        self._skipped = set()  # Barbers that lose the current minute, see _skip()
+        self._turn_out_at = None
+        self._emptied = None  # Minute the last barber went home
+        if stats is not None:
+            stats.attach(self)
+
+        self.report(0, OPENED, None)
+        for barber in self.barbers:
+            self._join(barber, 0)
+        if kick_out is not None:
+            self._schedule_turn_out(kick_out + 1)
+
+    ## ----------*----------*  Scheduling  *----------*---------- ##
+    def add_arrivals(self, arrivals):
+        """Customers walk in at the given minutes (since opening)
+        `arrivals` are (minute, customer) pairs sorted by minute, or a cursor with ArrivalCursor's
+        seek / peek / take (see table.TableCursor); arrivals before now never happen
+        """
+        self.arrivals = arrivals if hasattr(arrivals, "take") else ArrivalCursor(arrivals)
+        self.arrivals.seek(self.now)
+
+    def walk_ins(self, every, make_customer, start=0):
+        """A new customer from `make_customer()` every `every` minutes for as long as the shop runs
+        """
+        self._walk_ins += 1
+        self.calendar.push(start, ARRIVE, self._walk_ins, _WalkIns(every, make_customer))
+
+    def closes(self):
+        """Minute the day ends at, as far as we know now
+        """
+        if self.until is not None:
+            return self.until
+        if self.barbers:
+            return float("inf")
+        last = self._emptied + 1 if self._emptied is not None else 0
+        return max(self.last_entry or 0, last)
+
+    ## ----------*----------*  Changing plans mid-day  *----------*---------- ##
+    def add_barber(self, barber, minute):
+        """`barber` clocks in at `minute` (not before the minute the day is paused at, see run) and looks
+        for a customer straight away
+        """
+        self.barbers.append(barber)
+        self._join(barber, minute)
+        self._plan_barber(barber, minute, visit=True)
+
+    def extend_hours(self, minutes):
+        """Stay open `minutes` longer: the day's end, closing, last entry and turning out all move
+        """
+        for name in ("until", "closing", "last_entry", "kick_out"):
+            if getattr(self, name) is not None:
+                setattr(self, name, getattr(self, name) + minutes)
+        if self._turn_out_at is not None:  # Turning out still to come, at the old time
+            self.calendar.remove(SWEEP)
+            self._turn_out_at = None
+            self._schedule_turn_out(self.kick_out + 1)
+
+    ## ----------*----------*  Running  *----------*---------- ##
+    def run(self, stop=None):
+        """Work through the calendar until the shop closes, return the closing minute
+        With `stop`, pause before anything at that minute happens instead and return None; run() again
+        goes on from there. A paused day doesn't close early for having nothing left to do before `stop`:
+        arrivals may still be added (see franchise)
+        """
+        while True:
+            minute = self._next_minute()
+            if stop is not None and (minute is None or minute >= stop) and stop < self.closes():
+                return None
+            if minute is None or minute >= self.closes():
+                break
+            self._set_time(minute)
+            self._skipped.clear()
+            self._sweep(minute, self.deadlines.expire(minute))
+            self._usher(minute)
+            self._check_barbers(minute)
+        closed = self.closes()
+        if closed == float("inf"):  # Nothing left to happen
+            closed = self.now
+        ## Whoever is still waiting waited through the last minute too
+        for customer in self.waiting_area:
+            if self._credited[customer] < closed - 1:
+                self._credit(customer, closed - 1)
+        self._set_time(closed)
+        self.report(closed, CLOSED, None)
+        return closed
+
+    def _set_time(self, minute):
+        self.now = minute
+        if self.on_time is not None:
+            self.on_time(minute)
+
+    def _next_minute(self):
+        """Earliest of the next calendar event, the next arrival and the next patience deadline
+        """
+        minute = None
+        for due in (self.arrivals.peek(), self.calendar.peek()[0] if self.calendar else None,
+                    self.deadlines.next_wakeup()):
+            if due is not None and (minute is None or due < minute):
+                minute = due
+        return minute
+
+    def _next(self, minute, phase):
+        """Peek the next live calendar entry for this minute and phase, dropping stale ones on the way
+        """
+        while self.calendar:
+            at, ph, key, payload = self.calendar.peek()
+            if at != minute or ph != phase:
+                return None
+            if phase == ARRIVE or payload is None or self._due.get(payload) == at:
+                return key, payload
+            self._pop_barber()
+        return None
+
+    def _pop_barber(self):
+        at, _, barber = self.calendar.pop()
+        if self._parked.get(barber) == at:
+            del self._parked[barber]
+        return barber
+
+    ###### 0. Clear out the waiting area
+    def _sweep(self, minute, expired):
+        """`expired` are the customers whose patience ran out just now
+        """
+        if self._next(minute, SWEEP) is not None:
+            self.calendar.pop()
+            self._turn_out(minute)
+        ## Newest first, the order they always left in
+        expired = [customer for customer in expired if customer in self._entry]
+        expired.sort(key=self._entry.get, reverse=True)
+        for customer in expired:
+            self._renege(customer, minute)
+
+    def _renege(self, customer, minute):
+        self._credit(customer, minute)
+        if customer.status == "Waiting":  # Still fine, look again later
+            self._plan_customer(customer)
+            return
+        self.waiting_area.remove_customer(customer)
+        self._forget_customer(customer)
+        self.report(minute, RENEGED, customer)
+
+    def _turn_out(self, minute):
+        """Closing time, kick em all out (newest first, same as reneging customers)
+        """
+        self._turn_out_at = None
+        rejects = list(self.waiting_area)
+        rejects.reverse()
+        for customer in rejects:
+            self._credit(customer, minute)
+            if customer.status != "unfulfilled":
+                customer.status = "furious"
+            self.waiting_area.remove_customer(customer)
+            self._forget_customer(customer)
+        for customer in rejects:
+            self.report(minute, RENEGED if customer.status == "unfulfilled" else TURNED_OUT, customer)
+
+    def _schedule_turn_out(self, minute):
+        if self._turn_out_at is None:
+            self._turn_out_at = minute
+            self.calendar.push(minute, SWEEP, 0, None)
+
+    ###### 1. Usher in new customers
+    def _usher(self, minute):
+        if self.arrivals.peek() == minute:
+            for customer in self.arrivals.take(minute):
+                self._admit(customer, minute)
+        while self._next(minute, ARRIVE) is not None:
+            _, _, walk_ins = self.calendar.pop()
+            self._walk_ins += 1
+            self.calendar.push(minute + walk_ins.every, ARRIVE, self._walk_ins, walk_ins)
+            self._admit(walk_ins.make_customer(), minute)
+
+    def _admit(self, customer, minute):
+        """Customer walks in: send them away if it is too late or the waiting area is full
+        """
+        self.report(minute, ENTERED, customer)
+
+        ## Too late though?
+        if self.last_entry is not None and minute >= self.last_entry:
+            customer.status = "cursing himself"
+            self.report(minute, TOO_LATE, customer)
+            return
+
+        ## Add to waiting area
+        reject = self.waiting_area.add_customer(customer)
+        if reject:
+            self.report(minute, BALKED, reject)
+            return
+        if self.patience is not None:
+            customer.patience = self.patience()
+        self._credited[customer] = minute
+        self._entries += 1
+        self._entry[customer] = self._entries
+        self._plan_customer(customer)
+        if self.kick_out is not None and minute > self.kick_out:
+            self._schedule_turn_out(minute + 1)
+
+    def _plan_customer(self, customer):
+        """Customer gives up once proceed() has seen more than their patience worth of waiting
+        """
+        if customer.patience is not None:
+            self.deadlines.insert(customer, self._credited[customer] + customer.patience - customer.wait_time + 1)
+
+    def _credit(self, customer, minute):
+        minutes = minute - self._credited[customer]
+        if minutes:
+            customer.proceed(minutes)
+        self._credited[customer] = minute
+
+    def _forget_customer(self, customer):
+        del self._credited[customer]
+        del self._entry[customer]
+        if customer in self.deadlines:
+            self.deadlines.cancel(customer)
+
+    ###### 2./3. Check on barbers, put customers in seats
+    def _check_barbers(self, minute):
+        """Visit every barber with something due, and idle ones while someone waits, in roster order
+        """
+        while True:
+            due = self._next(minute, BARBER)
+            idle = None
+            if self.waiting_area:
+                for seq in self._idle:
+                    if self._idlers[seq] not in self._skipped:
+                        idle = (seq, self._idlers[seq])
+                        break
+            if due is None and idle is None:
+                return
+            if idle is None or (due is not None and due[0] <= idle[0]):
+                barber = self._pop_barber()
+            else:
+                barber = idle[1]
+            self._visit(barber, minute)
+
+    def _visit(self, barber, minute):
+        self._due.pop(barber, None)
+        barber.proceed(minute - self._credited[barber])
+        self._credited[barber] = minute
+        if barber.status == "Ready" and self.closing is not None and minute >= self.closing:
+            barber.status = "Leaving"
+
+        ## Finished with a customer? Usher them out
+        if barber.status == "Done":
+            self.report(minute, CUT_ENDED, barber)
+            self.report(minute, SERVED, barber.customer)
+            barber.status = "Ready"
+            barber.customer = None
+
+        ## Ready for a new one (can happen after finishing the previous)
+        if barber.status == "Ready":
+            if self.waiting_area:
+                self._seat(barber, minute)
+            else:
+                self._set_idle(barber)
+            self._plan_barber(barber, minute + 1)
+
+        ## Done with shift? Sub in a new one
+        elif barber.status == "Leaving":
+            self.report(minute, SHIFT_ENDED, barber)
+            self._leave(barber, minute)
+
+        else:
+            self._plan_barber(barber, minute + 1)
+
+    def _seat(self, barber, minute):
+        """Longest waiting customer into the barber's chair
+        """
+        customer = self.waiting_area.get_patient_customer()
+        self._credit(customer, minute)
+        self._forget_customer(customer)
+        self._set_busy(barber)
+        barber.cut(customer)
+        self.report(minute, CUT_STARTED, barber)
+
+    def _plan_barber(self, barber, earliest, visit=False):
+        """Put the barber's next visit on the calendar: end of the cut, or going home once idle
+        """
+        credited = self._credited[barber]
+        if visit:
+            due = earliest
+        elif barber.customer is not None:
+            due = credited + max(barber.cut_time_left, 1)
+        else:
+            due = None
+            shift_len = getattr(barber, "shift_len", self.shift_len)  # Shifts of their own length, see staffing
+            if shift_len is not None:
+                due = credited + shift_len - barber.time_on_shift + 1
+            if self.closing is not None:
+                due = self.closing if due is None else min(due, self.closing)
+            if due is None:  # Works until the day ends
+                return
+            due = max(due, earliest)
+            ## Idle again before going home: the entry from last time is still there, don't pile up another
+            if self._parked.get(barber) == due:
+                self._due[barber] = due
+                return
+            self._parked[barber] = due
+        self._due[barber] = due
+        self.calendar.push(due, BARBER, self._seq[barber], barber)
+
+    def _join(self, barber, minute):
+        """Barber clocks in at `minute` and gets visited from that minute on
+        """
+        self.report(minute, SHIFT_STARTED, barber)
+        self._roster += 1
+        self._seq[barber] = self._roster
+        self._credited[barber] = minute - 1
+        self._set_idle(barber)
+        self._plan_barber(barber, minute)
+
+    def _leave(self, barber, minute):
+        ix = self.barbers.index(barber)
+        self.barbers.pop(ix)
+        self._set_busy(barber)
+        del self._credited[barber]
+        del self._seq[barber]
+        self._parked.pop(barber, None)
+
+        ## Add a new barber to those on shift from any relief ones ready and waiting
+        if self.relief:
+            relief = self.make_barber(self.relief.pop())
+            self.barbers.append(relief)
+            self._join(relief, minute)
+
+        if ix < len(self.barbers):
+            self._skip(self.barbers[ix], minute)
+        if not self.barbers:
+            self._emptied = minute
+
+    def _skip(self, barber, minute):
+        """The old loop popped the leaving barber while enumerating the roster, so the next one
+        wasn't proceed()-ed for that minute. Keep it that way so results don't change
+        """
+        self._skipped.add(barber)
+        self._credited[barber] += 1
+        idle = barber.customer is None
+        self._plan_barber(barber, minute + 1, visit=idle and bool(self.waiting_area))
+
+    def _set_idle(self, barber):
+        seq = self._seq[barber]
+        if seq not in self._idlers:
+            bisect.insort(self._idle, seq)
+            self._idlers[seq] = barber
+
+    def _set_busy(self, barber):
+        seq = self._seq[barber]
+        if self._idlers.pop(seq, None) is not None:
+            self._idle.pop(bisect.bisect_left(self._idle, seq))
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+## Patience drawers are small classes rather than lambdas so they pickle, random source and all (see fork)
+def fixed_patience(minutes):
+    """Everybody gives up after the same number of minutes (None: nobody ever does)
+    """
+    return _Patience(_fixed, None, minutes)
+
+
+def uniform_patience(low, high, rng=random):
+    """Patience anywhere from `low` to `high` minutes
+    """
+    return _Patience(_uniform, rng, low, high)
+
+
+def exponential_patience(mean, rng=random):
+    """Memoryless patience, `mean` minutes on average (rounded, at least 0)
+    """
+    return _Patience(_exponential, rng, mean)
+
+
+def describe(kind, subject, now):
+    """The manager's log line for an event, `now` being the HH:MM clock
+
+    Examples:
+    >>> class Someone(object): name, status = "Customer-1", "satisfied"
+    >>> describe(SERVED, Someone(), "09:30")
+    '09:30 Customer-1 left satisfied'
+    """
+    if kind == OPENED:
+        return "{} Barber shop opened".format(now)
+    if kind == CLOSED:
+        return "{} Barber shop closed".format(now)
+    if kind == SHIFT_STARTED:
+        return "{} {} started shift".format(now, subject.name)
+    if kind == SHIFT_ENDED:
+        return "{} {} ended shift".format(now, subject.name)
+    if kind == CUT_STARTED:
+        return "{} {} started cutting {}'s hair".format(now, subject.name, subject.customer.name)
+    if kind == CUT_ENDED:
+        return "{} {} ended cutting {}'s hair".format(now, subject.name, subject.customer.name)
+    if kind == ENTERED:
+        return "{} {} entered".format(now, subject.name)
+    if kind == TOO_LATE:
+        return "{} {} leaves {}".format(now, subject.name, subject.status)
+    return "{} {} left {}".format(now, subject.name, subject.status)
+
+
+def _fixed(rng, minutes):
+    return minutes
+
+
+def _uniform(rng, low, high):
+    return rng.randint(low, high)
+
+
+def _exponential(rng, mean):
+    return int(round(rng.expovariate(1.0 / mean)))
@@ -0,0 +1,227 @@
+"""
+Pausing a day, snapshotting it, and forking what-if branches from there
+General Approach:
+    * Manager.run(stop=minute) pauses a day before anything at `minute` happens; snapshot() pickles the
+      paused Manager (waiting area, who is in which chair, calendar, patience wheel, the random source of its
+      patience drawer) together with a Tally of the day so far into one bytes string
+    * The report callback and any PhaseStats wrappers stay out of it; a branch reports to its own copy
+      of the Tally, so its numbers cover the whole day
+    * Big read-only things the day only looks at (the CustomerTable behind a TableCursor and its arrival
+      order, or whatever else is passed as `shared`) are pickled by reference: branches in this process use
+      the very same objects, and fork()'s worker processes inherit them copy-on-write. A branch only makes
+      its own copy of the shop state, so memory grows with how far branches diverge, not with their number
+    * A branch is a list of changes (add_barber, set_seats / close_bench, extend_hours, or any function of
+      the Manager and the minute), applied to a fresh copy of the snapshot before it runs to closing; fork() runs branches
+      on a process pool the way montecarlo.replicate() runs days
+
+    manager = open_shop((), barbers, 5, report=tally)
+    manager.add_arrivals(TableCursor(table, _OPEN_TIME))
+    paused = unclock("14:00") - _OPEN_TIME
+    manager.run(stop=paused)
+    snap = snapshot(manager, paused, tally)
+    for name, summary in fork(snap, {"as is": [], "extra barber": [add_barber("Extra")],
+                                     "bench closed": [close_bench()], "open late": [extend_hours(60)]}):
+        print(name, summary)
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import collections
+import functools
+import io
+import os
+import pickle
+
+from .engine import Manager, BALKED, TOO_LATE, RENEGED, TURNED_OUT, SERVED
+from .instrument import PHASES
+from .montecarlo import _percentile
+from .shop import Barber
+from .table import TableCursor
+
+BranchSummary = collections.namedtuple("BranchSummary", "served balked reneged turned_out mean_time p90_time "
+                                                        "closed")
+
+## Manager attributes a snapshot leaves out: the callbacks, and PhaseStats' timed wrappers if it had any
+_CALLBACKS = frozenset(("report", "on_time", "_check_barbers") + tuple(PHASES.values()))
+
+_SNAPSHOT = None  # The snapshot a fork() worker process runs branches of
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class Tally(object):
+    """Report callback counting how a day goes; part of a snapshot, so branches go on from the day so far
+    """
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.times = []  # Wait plus cut of everyone served
+        self.closed = None
+
+    def __call__(self, minute, kind, subject):
+        self.counts[kind] += 1
+        if kind == SERVED:
+            self.times.append(subject.wait_time + subject.serve_time)
+
+    def summary(self):
+        times = sorted(self.times)
+        counts = self.counts
+        return BranchSummary(counts[SERVED], counts[BALKED] + counts[TOO_LATE], counts[RENEGED], counts[TURNED_OUT],
+                             sum(times) / float(len(times)) if times else 0.0, _percentile(times, 90), self.closed)
+
+
+class Snapshot(object):
+    """A paused day: `minute` it was paused before, `data` the pickled shop and Tally, `shared` the objects
+    pickled by reference. Pickling a Snapshot itself takes `shared` along, e.g. to save it to a file
+    """
+
+    def __init__(self, minute, data, shared):
+        self.minute = minute
+        self.data = data
+        self.shared = shared
+
+    def __len__(self):
+        return len(self.data)
+
+    def restore(self, report=None):
+        """(Manager, Tally) carrying on from the snapshot, each one new; the Manager reports to the Tally,
+        and to `report` too if given
+        """
+        state, tally = _SharingUnpickler(io.BytesIO(self.data), self.shared).load()
+        manager = Manager.__new__(Manager)
+        manager.__dict__.update(state)
+        manager.report = tally if report is None else _Both(tally, report)
+        manager.on_time = None
+        return manager, tally
+
+
+class _SharingPickler(pickle.Pickler):
+    """Pickles the objects in `shared` as their position in it"""
+
+    def __init__(self, file, shared):
+        super(_SharingPickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._ids = dict((id(obj), i) for i, obj in enumerate(shared))
+
+    def persistent_id(self, obj):
+        return self._ids.get(id(obj))
+
+
+class _SharingUnpickler(pickle.Unpickler):
+    """Hands back the very objects in `shared` for what _SharingPickler left out"""
+
+    def __init__(self, file, shared):
+        super(_SharingUnpickler, self).__init__(file)
+        self._shared = shared
+
+    def persistent_load(self, pid):
+        return self._shared[pid]
+
+
+class _Both(object):
+    """Report to two callbacks"""
+
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+
+    def __call__(self, minute, kind, subject):
+        self.first(minute, kind, subject)
+        self.second(minute, kind, subject)
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def snapshot(manager, minute, tally=None, shared=()):
+    """Snapshot of `manager` paused before `minute` (see Manager.run's stop) and the Tally that has been
+    counting its day (a new one if None)
+    """
+    shared = list(shared)
+    if isinstance(manager.arrivals, TableCursor):
+        shared += [manager.arrivals.table, manager.arrivals.order]
+    buffer = io.BytesIO()
+    _SharingPickler(buffer, shared).dump((
+        dict((name, value) for name, value in manager.__dict__.items() if name not in _CALLBACKS),
+        tally if tally is not None else Tally()))
+    return Snapshot(minute, buffer.getvalue(), shared)
+
+
+def run_branch(snap, changes=()):
+    """Apply `changes` (functions of the Manager and the minute, see add_barber & co.) to a fresh copy of the snapshot,
+    run it to closing and summarize the whole day
+    """
+    manager, tally = snap.restore()
+    for change in changes:
+        change(manager, snap.minute)
+    tally.closed = manager.run()
+    return tally.summary()
+
+
+def fork(snap, branches, workers=None):
+    """run_branch() for every (name, changes) in `branches` (a dict or pairs), on `workers` processes (all cores
+    by default); yields (name, BranchSummary) as they finish. Changes have to pickle, which add_barber & co. do
+    """
+    branches = list(branches.items() if isinstance(branches, dict) else branches)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(branches) < 2:
+        for name, changes in branches:
+            yield name, run_branch(snap, changes)
+        return
+    import multiprocessing  # Slow to import, and only needed here
+    ## The snapshot goes to each worker once, when it starts (with fork: not even that, it is inherited)
+    pool = multiprocessing.Pool(min(workers, len(branches)), _adopt, (snap,))
+    try:
+        for done in pool.imap_unordered(_run_named, branches):
+            yield done
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _adopt(snap):
+    global _SNAPSHOT
+    _SNAPSHOT = snap
+
+
+def _run_named(branch):
+    name, changes = branch
+    return name, run_branch(_SNAPSHOT, changes)
+
+
+## ----------*----------*  Changes  *----------*---------- ##
+def add_barber(name):
+    """A barber called `name` starts when the branch does
+    """
+    return functools.partial(_add_barber, name)
+
+
+def set_seats(seats):
+    """The waiting area holds `seats` from now on; whoever is waiting already stays
+    """
+    return functools.partial(_set_seats, seats)
+
+
+def close_bench():
+    """Nobody new gets in (everyone comes in through the waiting area); whoever is waiting already stays
+    """
+    return set_seats(0)
+
+
+def extend_hours(minutes):
+    """Stay open `minutes` longer (see Manager.extend_hours)
+    """
+    return functools.partial(_extend_hours, minutes)
+
+
+def _add_barber(name, manager, minute):
+    manager.add_barber(Barber(name, manager.shift_len), minute)
+
+
+def _set_seats(seats, manager, minute):
+    manager.waiting_area._MAX_CUSTOMERS = seats
+
+
+def _extend_hours(minutes, manager, minute):
+    manager.extend_hours(minutes)
@@ -0,0 +1,244 @@
+"""
+Several shops at once, with customers walking over to a nearby shop when one is full
+General Approach:
+    * Each shop is its own Manager, run in a process of its own (or a few shops per process with fewer
+      `workers`); a customer who balks at a full waiting area walks to the nearest shop they haven't tried,
+      arriving there `travel` minutes later
+    * Those walks are timestamped messages. Nothing a shop does before minute T can reach another shop before
+      T + lookahead, the shortest walk, so every shop runs the window [T, T + lookahead) on its own
+      (Manager.run(stop=...)), then all the messages of the window are swapped and the next one starts:
+      conservative, so no shop ever has to undo anything
+    * Messages are sorted (arrival minute, shop they came from, order sent) before they are delivered and
+      every shop keeps its own customers and settings, so the result doesn't depend on how many processes
+      there are or which one finishes first: workers=1 runs everything in this process, same numbers
+    * Arrivals are the shop's own (a CustomerTable or sorted Customers) merged with the walk-overs delivered
+      so far, through _Arrivals, a cursor like table.TableCursor
+
+    shops = [ShopSpec("North", ["A", "B"], 3, north), ShopSpec("South", ["C"], 5, south)]
+    for result in run_franchise(shops, {("North", "South"): 15}):
+        print(result.name, result.summary, result.sent, result.received)
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import collections
+import heapq
+import os
+
+from .engine import ArrivalCursor, BALKED
+from .fork import Tally
+from .shop import Customer, open_shop, _OPEN_TIME, _CLOSING_TIME
+from .table import CustomerTable, TableCursor
+
+ShopSpec = collections.namedtuple("ShopSpec", "name barbers seats customers")
+ShopSpec.__doc__ = """A shop: `barbers` (names), `seats` waiting places, its own `customers` (CustomerTable or Customers
+sorted by arrive_time)"""
+ShopResult = collections.namedtuple("ShopResult", "name summary sent received")
+
+## A customer on their way: arrival minute (since opening), to, from, order sent from there, then the customer
+_Walk = collections.namedtuple("_Walk", "minute to origin seq name serve_time patience tried")
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class _Arrivals(object):
+    """A shop's own arrivals (any cursor) plus customers walking over from other shops, in minute order;
+    at the same minute the shop's own come first, then walk-overs in the order they were delivered
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self._walk_ins = []  # Heap of (minute, delivered order, customer)
+        self._delivered = 0
+
+    def add(self, minute, customer):
+        self._delivered += 1
+        heapq.heappush(self._walk_ins, (minute, self._delivered, customer))
+
+    def seek(self, minute):
+        self.cursor.seek(minute)
+
+    def peek(self):
+        own = self.cursor.peek()
+        if self._walk_ins and (own is None or self._walk_ins[0][0] < own):
+            return self._walk_ins[0][0]
+        return own
+
+    def take(self, minute):
+        customers = self.cursor.take(minute) if self.cursor.peek() == minute else []
+        while self._walk_ins and self._walk_ins[0][0] == minute:
+            customers.append(heapq.heappop(self._walk_ins)[2])
+        return customers
+
+
+class _Shop(object):
+    """One shop's day, run a window at a time; balking customers become _Walks in `outbox`"""
+
+    def __init__(self, spec, walks, t_start, t_end, hops, settings):
+        self.name = spec.name
+        self.walks = walks  # [(minutes, other shop)], nearest first
+        self.hops = hops
+        self.tally = Tally()
+        self.outbox = []
+        self.sent = self.received = 0
+        if isinstance(spec.customers, CustomerTable):
+            cursor = TableCursor(spec.customers, t_start)
+        else:
+            cursor = ArrivalCursor((customer.arrive_time - t_start, customer) for customer in spec.customers)
+        self.arrivals = _Arrivals(cursor)
+        self.manager = open_shop((), spec.barbers, spec.seats, t_start, t_end, self._report, **settings)
+        self.manager.add_arrivals(self.arrivals)
+
+    def deliver(self, walk):
+        customer = Customer(0, "", walk.minute, walk.serve_time, walk.patience)
+        customer.name = walk.name  # Customer-<n>:<name> from their own shop
+        customer.tried = walk.tried
+        self.arrivals.add(walk.minute, customer)
+        self.received += 1
+
+    def advance(self, stop):
+        """Run up to (not including) `stop`, or to closing if the day ends before it; hand over the outbox
+        """
+        if self.tally.closed is None:
+            self.tally.closed = self.manager.run(stop)
+        outbox, self.outbox = self.outbox, []
+        return outbox
+
+    def _report(self, minute, kind, subject):
+        self.tally(minute, kind, subject)
+        if kind == BALKED:
+            tried = getattr(subject, "tried", ())
+            if len(tried) < self.hops:
+                tried += (self.name,)
+                for minutes, other in self.walks:
+                    if other not in tried:
+                        self.sent += 1
+                        self.outbox.append(_Walk(minute + minutes, other, self.name, self.sent, subject.name,
+                                                 subject.serve_time, subject.patience, tried))
+                        break
+
+
+class _Local(object):
+    """All the shops in this process"""
+
+    def __init__(self, make):
+        self.shops = [_Shop(*args) for args in make]
+
+    def advance(self, stop, inbox):
+        return _advance(self.shops, stop, inbox)
+
+    def results(self):
+        return _results(self.shops)
+
+    def close(self):
+        pass
+
+
+class _Hosts(object):
+    """Shops spread over `workers` processes, each driven over a pipe one window at a time"""
+
+    def __init__(self, make, workers):
+        import multiprocessing  # Slow to import, and only needed here
+        self.pipes, self.processes, self.names = [], [], []
+        for i in range(workers):
+            mine, theirs = multiprocessing.Pipe()
+            self.names.append([args[0].name for args in make[i::workers]])
+            process = multiprocessing.Process(target=_host, args=(theirs, make[i::workers]))
+            process.daemon = True
+            process.start()
+            self.pipes.append(mine)
+            self.processes.append(process)
+
+    def advance(self, stop, inbox):
+        for pipe, names in zip(self.pipes, self.names):
+            pipe.send((stop, dict((name, inbox[name]) for name in names if name in inbox)))
+        walks = []
+        for pipe in self.pipes:
+            walks.extend(pipe.recv())
+        return walks
+
+    def results(self):
+        results = []
+        for pipe in self.pipes:
+            pipe.send(None)
+            results.extend(pipe.recv())
+        return results
+
+    def close(self):
+        for process in self.processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def run_franchise(shops, travel, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, hops=1, workers=None, **settings):
+    """Run every ShopSpec in `shops` through the day, customers walking between them when one is full;
+    `travel` maps (shop, shop) pairs to minutes on foot (either way round; pairs left out are too far),
+    `hops` is how many shops a customer tries after their own. Returns a ShopResult per shop, in order
+    """
+    names = [spec.name for spec in shops]
+    routes = _routes(names, travel)
+    lookahead = min(minutes for walks in routes.values() for minutes, _ in walks) if any(routes.values()) else None
+    if lookahead is not None and lookahead < 1:
+        raise ValueError("walks between shops have to take at least a minute, got {}".format(lookahead))
+    day = t_end - t_start
+    lookahead = lookahead or day
+    make = [(spec, routes[spec.name], t_start, t_end, hops, settings) for spec in shops]
+    workers = min(workers or os.cpu_count() or 1, len(shops))
+    hosts = _Local(make) if workers == 1 else _Hosts(make, workers)
+    try:
+        inbox = {}
+        for stop in range(lookahead, day + lookahead, lookahead):
+            walks = hosts.advance(stop, inbox)
+            walks.sort(key=lambda walk: (walk.minute, walk.origin, walk.seq))
+            inbox = collections.defaultdict(list)
+            for walk in walks:
+                inbox[walk.to].append(walk)
+        results = hosts.results()
+    finally:
+        hosts.close()
+    by_name = dict((result.name, result) for result in results)
+    return [by_name[name] for name in names]
+
+
+def _routes(names, travel):
+    """Shop -> [(minutes, other shop)], nearest first (ties by name)
+    """
+    routes = dict((name, []) for name in names)
+    for (a, b), minutes in travel.items():
+        for here, there in ((a, b), (b, a)):
+            if here in routes and there in routes and there not in [other for _, other in routes[here]]:
+                routes[here].append((minutes, there))
+    for walks in routes.values():
+        walks.sort()
+    return routes
+
+
+def _host(pipe, make):
+    """Worker process: its shops, a window at a time, until asked for the results
+    """
+    shops = [_Shop(*args) for args in make]
+    while True:
+        job = pipe.recv()
+        if job is None:
+            pipe.send(_results(shops))
+            return
+        pipe.send(_advance(shops, *job))
+
+
+def _advance(shops, stop, inbox):
+    walks = []
+    for shop in shops:
+        for walk in inbox.get(shop.name, ()):
+            shop.deliver(walk)
+        walks.extend(shop.advance(stop))
+    return walks
+
+
+def _results(shops):
+    return [ShopResult(shop.name, shop.tally.summary(), shop.sent, shop.received) for shop in shops]
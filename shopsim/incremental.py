@@ -0,0 +1,220 @@
+"""
+Re-running a day after editing one customer, from the last checkpoint before the edit
+General Approach:
+    * IncrementalDay runs a CustomerTable day (see table.run_table) and, every `every` minutes, keeps a
+      checkpoint: a deep copy of the Manager (waiting area, barbers, calendar, patience wheel, counters)
+      sharing the table, the log and the arrival cursor with the live day, so each one costs about as much
+      as the people in the shop, not the day
+    * Along with it goes a signature of the shop's state: who is waiting and in which chair, how long
+      they have waited, when each barber is due next. Plain tuples, cheap to compare
+    * edit() changes a customer's arrival or service time, copies the checkpoint at or before the earlier of
+      their old and new arrival back in and runs on from there
+    * Once past both arrivals, the day depends only on the shop's state and the arrivals still to come, which
+      are the same as last time; so as soon as a checkpoint's signature matches last run's at the same minute,
+      the rest of the day is last run's. It stops there and keeps last run's log tail and outcome columns
+    * Patience drawn from a random source (Manager patience=) and PhaseStats are not supported: the first
+      would need the generator's state checkpointed too, the second wraps the Manager's methods
+
+    day = IncrementalDay(table, ["A", "B"], 5)
+    day.run()
+    day.edit(17, serve=45)      # day.resumed, day.converged: minutes it ran from and stopped at
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import bisect
+import collections
+import copy
+
+from .engine import CLOSED, TOO_LATE, BALKED, RENEGED, TURNED_OUT
+from .log import EventLog
+from .shop import open_shop, _OPEN_TIME, _CLOSING_TIME
+from .table import TableCursor, TableRecorder, NEVER, WAITING
+
+_EVERY = 30  # Minutes between checkpoints
+
+## Manager deep copy, its position in the log, its shop state signature
+_Checkpoint = collections.namedtuple("_Checkpoint", "manager log_len signature")
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class _Converged(Exception):
+    """The re-run caught up with the last run at `minute`"""
+
+    def __init__(self, minute):
+        super(_Converged, self).__init__(minute)
+        self.minute = minute
+
+
+class IncrementalDay(object):
+    """A CustomerTable's day that can be re-run from a checkpoint after editing a customer
+    Events go into `log` (an EventLog; a new one if None), and also to `report` while actually simulating
+    """
+
+    def __init__(self, table, barbers, seats, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, log=None, report=None,
+                 every=_EVERY, **settings):
+        if settings.get("patience") is not None or settings.get("stats") is not None:
+            raise ValueError("IncrementalDay can't checkpoint patience= or stats=")
+        self.table = table
+        self.barbers = list(barbers)
+        self.seats = seats
+        self.t_start = t_start
+        self.t_end = t_end
+        self.log = log if log is not None else EventLog(t_start)
+        self.report = report
+        self.every = every
+        self.settings = settings
+        self.resumed = None  # Minute (since opening) the last run started from
+        self.converged = None  # Minute the last run caught up with the one before, None if it ran to closing
+        self.kept = None  # Events at the front of `log` the last run left as they were
+        self._checkpoints = {}  # Minute -> _Checkpoint, state before anything at that minute happened
+        self._old = {}  # Last run's checkpoints, while re-running
+        self._settled = None  # Re-runs can only stop at checkpoints after this minute
+        self._manager = None
+        self._cursor = None
+        self._last = -1  # Last minute checkpoints were looked at
+
+    def run(self):
+        """The whole day from opening, checkpoints and all
+        """
+        self.table.reset()
+        self.log.truncate(0)
+        self._checkpoints, self._old, self._settled = {}, {}, None
+        self._last = -1
+        self._cursor = TableCursor(self.table, self.t_start)
+        self._manager = open_shop((), self.barbers, self.seats, self.t_start, self.t_end,
+                                  TableRecorder(self.table, self.t_start, self._record), **self.settings)
+        self._manager.add_arrivals(self._cursor)
+        self._manager.on_time = self._tick
+        self.resumed, self.converged, self.kept = 0, None, 0
+        self._manager.run()
+
+    def edit(self, row, arrive=None, serve=None):
+        """Give the customer in `row` a new arrival (minutes since midnight) and / or service time and re-run
+        the day from the last checkpoint before it mattered; returns (resumed, converged) like the attributes
+        """
+        table = self.table
+        before = table.arrive[row]
+        if arrive is not None:
+            table.arrive[row] = arrive
+        if serve is not None:
+            table.serve[row] = serve
+        ## Whatever they did last time, they may not get to do at all now (e.g. come after closing)
+        outcome = table.wait[row], table.start[row], table.end[row], table.status[row]
+        table.wait[row], table.start[row], table.end[row], table.status[row] = 0, NEVER, NEVER, WAITING
+        self.rerun(min(before, table.arrive[row]), max(before, table.arrive[row]))
+        ## Caught up while they were still in the shop: they leave as they did last time
+        if self.converged is not None and row in self._manager.report._inside:
+            table.wait[row], table.start[row], table.end[row], table.status[row] = outcome
+        return self.resumed, self.converged
+
+    def rerun(self, first, last):
+        """Re-run after the table changed for customers arriving `first`..`last` (minutes since midnight)
+        """
+        if not self._checkpoints:
+            self.run()
+            return self.resumed, self.converged
+        marks = sorted(self._checkpoints)
+        start = marks[max(bisect.bisect_right(marks, first - self.t_start) - 1, 0)]
+        checkpoint = self._checkpoints[start]
+        self._old = self._checkpoints
+        self._checkpoints = dict((mark, self._old[mark]) for mark in marks if mark <= start)
+        self._settled = last - self.t_start
+        tail = self.log[checkpoint.log_len:len(self.log)]
+        self.log.truncate(checkpoint.log_len)
+
+        self._manager = self._restore(checkpoint)
+        self._cursor = TableCursor(self.table, self.t_start)
+        self._cursor.seek(start)
+        self._manager.arrivals = self._cursor
+        self._last = start
+        self.resumed, self.converged, self.kept = start, None, checkpoint.log_len
+        try:
+            self._manager.run()
+        except _Converged as caught:
+            self.converged = caught.minute
+            self._splice(caught.minute, tail, checkpoint.log_len)
+        self._old, self._settled = {}, None
+        return self.resumed, self.converged
+
+    def _record(self, minute, kind, subject):
+        ## The table only gets start / end written for cuts; clear what last run left there for everyone else
+        table = self.table
+        if kind in (TOO_LATE, BALKED, RENEGED, TURNED_OUT):
+            table.start[subject.row] = table.end[subject.row] = NEVER
+        elif kind == CLOSED:
+            for customer in self._manager.waiting_area:
+                table.start[customer.row] = table.end[customer.row] = NEVER
+            for barber in self._manager.barbers:
+                if barber.customer is not None:
+                    table.end[barber.customer.row] = NEVER
+        self.log(minute, kind, subject)
+        if self.report is not None:
+            self.report(minute, kind, subject)
+
+    def _tick(self, minute):
+        """The Manager's clock moved to `minute`: checkpoint every mark it went past, or stop if caught up
+        """
+        manager = self._manager
+        if minute >= manager.closes():  # Wrapping up the day, nothing to come back to
+            return
+        mark = (self._last // self.every + 1) * self.every
+        self._last = minute
+        if mark > minute:
+            return
+        signature = _signature(manager)
+        checkpoint = None
+        while mark <= minute:
+            old = self._old.get(mark)
+            if old is not None and mark > self._settled and old.signature == signature:
+                raise _Converged(mark)
+            if checkpoint is None:
+                checkpoint = _Checkpoint(copy.deepcopy(manager, self._memo()), len(self.log), signature)
+            self._checkpoints[mark] = checkpoint
+            mark += self.every
+
+    def _restore(self, checkpoint):
+        """A Manager to run on from `checkpoint`, which stays as it is for next time
+        """
+        return copy.deepcopy(checkpoint.manager, self._memo())
+
+    def _memo(self):
+        """What checkpoints share with the live day instead of copying
+        """
+        memo = {}
+        for shared in (self, self.table, self.log, self._cursor, self._cursor.order):
+            memo[id(shared)] = shared
+        return memo
+
+    def _splice(self, minute, tail, resumed_at):
+        """Last run from checkpoint `minute` on: its log tail, and its checkpoints moved to the new log positions
+        """
+        old = self._old[minute]
+        shift = len(self.log) - old.log_len  # Last run's events from there on sit this much further along now
+        self.log.extend(tail[old.log_len - resumed_at:])
+        for mark, checkpoint in self._old.items():
+            if mark >= minute:
+                self._checkpoints[mark] = checkpoint._replace(log_len=checkpoint.log_len + shift)
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def _signature(manager):
+    """Everything about the shop that decides what happens next, by table row rather than by object
+    """
+    deadlines = manager.deadlines
+    waiting = tuple((customer.row, customer.serve_time, customer.wait_time, customer.status, customer.patience,
+                     manager._credited[customer],
+                     deadlines.deadline(customer) if customer in deadlines else None)
+                    for customer in manager.waiting_area)
+    barbers = tuple((barber.name, barber.status, barber.cut_time_left, barber.time_on_shift,
+                     manager._credited[barber], manager._due.get(barber), manager._parked.get(barber),
+                     manager._seq[barber] in manager._idlers,
+                     None if barber.customer is None else (barber.customer.row, barber.customer.serve_time,
+                                                           barber.customer.wait_time))
+                    for barber in manager.barbers)
+    return waiting, barbers, tuple(manager.relief), manager._turn_out_at, manager._emptied
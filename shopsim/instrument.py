@@ -0,0 +1,117 @@
+"""
+Opt-in timing of the Manager's phases
+General Approach:
+    * A PhaseStats handed to the Manager (stats=...) swaps timed wrappers in for the Manager's own phase
+      methods, on that one instance; without one nothing is wrapped, so an untimed day runs exactly the
+      code it always did
+    * Phases: "sweep" (impatient and turned out customers leave), "usher" (arrivals come in), "barbers"
+      (the barber loop) and "seat" (a customer into a free chair, part of "barbers")
+    * The waiting line is looked at after every busy minute and kept as a histogram of how many minutes
+      it held that many people
+    * summary() is plain data (json() for text), text() one line for a status bar
+
+    stats = PhaseStats()
+    manage_day(customers, barbers, seats, stats=stats)
+    print(stats.json())
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import collections
+import time
+
+## Phase name -> the Manager method it times
+PHASES = collections.OrderedDict([("sweep", "_sweep"), ("usher", "_usher"), ("barbers", "_check_barbers"),
+                                  ("seat", "_seat")])
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class PhaseStats(object):
+    """Wall time and calls per phase, and minutes spent at each waiting line length, for one day
+    """
+
+    def __init__(self, timer=time.perf_counter):
+        self.timer = timer
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.line = collections.Counter()  # People waiting -> minutes
+        self.minutes = 0  # Busy minutes the Manager stopped at
+        self._manager = None
+        self._seen = (0, 0)  # (minute, line length) last looked at
+
+    def attach(self, manager):
+        """Time `manager`'s phases from now on (the Manager does this itself when given stats=)
+        """
+        self._manager = manager
+        self._seen = (manager.now, len(manager.waiting_area))
+        for phase, method in PHASES.items():
+            setattr(manager, method, self._timed(phase, getattr(manager, method)))
+        check_barbers = manager._check_barbers
+
+        def barbers_then_look(minute):
+            check_barbers(minute)
+            self._look(minute)
+        manager._check_barbers = barbers_then_look
+
+    def summary(self):
+        """Everything measured, as plain dicts and numbers (JSON friendly)
+        """
+        line = self._line()
+        waited = sum(line.values())
+        return {
+            "minutes": self.minutes,
+            "phases": collections.OrderedDict(
+                (phase, {"seconds": self.seconds[phase], "calls": self.calls[phase],
+                         "us_per_call": self.seconds[phase] * 1e6 / self.calls[phase] if self.calls[phase] else 0.0})
+                for phase in PHASES),
+            "line": collections.OrderedDict((str(n), line[n]) for n in sorted(line)),
+            "mean_line": sum(n * m for n, m in line.items()) / float(waited) if waited else 0.0,
+            "max_line": max(line) if line else 0,
+        }
+
+    def json(self, indent=1):
+        import json
+        return json.dumps(self.summary(), indent=indent)
+
+    def text(self):
+        """One line: where the time went and how long the line got
+        """
+        total = sum(self.seconds[phase] for phase in PHASES if phase != "seat") or 1.0
+        summary = self.summary()
+        return "{}; line {:.1f} on average, {} at most".format(
+            ", ".join("{} {:.0f}% ({}x)".format(phase, 100 * self.seconds[phase] / total, self.calls[phase])
+                      for phase in PHASES),
+            summary["mean_line"], summary["max_line"])
+
+    def _timed(self, phase, method):
+        timer, seconds, calls = self.timer, self.seconds, self.calls
+
+        def timed(*args):
+            start = timer()
+            try:
+                return method(*args)
+            finally:
+                seconds[phase] += timer() - start
+                calls[phase] += 1
+        return timed
+
+    def _look(self, minute):
+        """The line held its last length from the last busy minute until this one
+        """
+        seen, length = self._seen
+        self.line[length] += minute - seen
+        self._seen = (minute, len(self._manager.waiting_area))
+        self.minutes += 1
+
+    def _line(self):
+        """Histogram up to where the Manager is now (the day's end once it has run)
+        """
+        line = collections.Counter(self.line)
+        if self._manager is not None:
+            seen, length = self._seen
+            if self._manager.now > seen:
+                line[length] += self._manager.now - seen
+        return +line
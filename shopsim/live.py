@@ -0,0 +1,134 @@
+"""
+A live shop: the day played out in real time on one asyncio event loop
+General Approach:
+    * One arrival coroutine and one coroutine per barber, no threads. The waiting bench is an
+      asyncio.Queue(maxsize=seats): a customer who finds it full balks (put_nowait raises QueueFull)
+    * Shop time runs at `minute` real seconds a shop minute off the loop's clock; every wait is until an
+      absolute shop minute, so late wake-ups don't add up over the day
+    * Customers are plain items on the bench, not tasks of their own, so tens of thousands can be in the
+      shop at once for the price of a deque entry each
+    * Shutdown is by sentinel: when arrivals run out (or one comes after closing) the producer queues one None
+      per barber behind whoever is still waiting; every barber serves what is ahead of it, takes its None and
+      goes home, and nobody on the bench is lost
+    * Events go to `report(minute, kind, subject)` like the Manager's, so an EventLog or TableRecorder works as is
+    * Not modelled here: patience (a customer on the bench waits to be served) and shifts (barbers stay until
+      the bench is empty)
+
+    run_live(customers, ["A", "B"], 5, minute=0.01)   # a 9-17 day in under 5 seconds
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import asyncio
+
+from .engine import (OPENED, CLOSED, SHIFT_STARTED, ENTERED, TOO_LATE, BALKED, CUT_STARTED, CUT_ENDED, SERVED,
+                     SHIFT_ENDED)
+from .shop import Barber, _OPEN_TIME, _CLOSING_TIME
+
+_MINUTE = 0.001  # Real seconds a shop minute by default: a 9-17 day in about half a second
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class _Clock(object):
+    """Shop minutes since opening, off the event loop's clock"""
+
+    def __init__(self, loop, minute):
+        self.loop = loop
+        self.minute = minute
+        self.opened = loop.time()
+
+    def now(self):
+        return int((self.loop.time() - self.opened) / self.minute + 1e-6)
+
+    async def until(self, at):
+        delay = self.opened + at * self.minute - self.loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def run_live(customers, barbers, seats, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, report=None, minute=_MINUTE):
+    """Run live_day() on an event loop of its own; returns the minute the shop closed
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(live_day(customers, barbers, seats, t_start, t_end, report, minute))
+    finally:
+        loop.close()
+
+
+async def live_day(customers, barbers, seats, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, report=None,
+                   minute=_MINUTE):
+    """Play the day out live: `customers` (in arrival order, any iterable) come in at their arrive_time,
+    K `barbers` (names) cut from a bench of `seats`; returns the minute (since opening) the shop closed,
+    which is when the last barber went home
+    """
+    if minute <= 0:
+        raise ValueError("a shop minute has to take some time, got {}".format(minute))
+    report = report if report is not None else _ignore
+    clock = _Clock(asyncio.get_event_loop(), minute)
+    bench = asyncio.Queue(maxsize=max(seats, 1))
+    staff = [Barber(name, None) for name in barbers]
+    report(0, OPENED, None)
+    for barber in staff:
+        report(0, SHIFT_STARTED, barber)
+    workers = [asyncio.ensure_future(_work(barber, bench, clock, report)) for barber in staff]
+    await _arrive(customers, bench, seats, len(staff), t_start, t_end - t_start, clock, report)
+    await asyncio.gather(*workers)
+    closed = max(clock.now(), t_end - t_start)
+    report(closed, CLOSED, None)
+    return closed
+
+
+async def _arrive(customers, bench, seats, barbers, t_start, day, clock, report):
+    """The producer: each customer onto the bench at their time (or away if it is full), then the sentinels
+    """
+    for customer in customers:
+        at = customer.arrive_time - t_start
+        await clock.until(at)
+        if at >= day:
+            ## Closed; whoever comes after them isn't even read, so an endless stream ends here too
+            customer.status = "cursing himself"
+            report(at, TOO_LATE, customer)
+            break
+        report(at, ENTERED, customer)
+        try:
+            if seats <= 0:
+                raise asyncio.QueueFull
+            bench.put_nowait((at, customer))
+        except asyncio.QueueFull:
+            customer.status = "impatient"
+            report(at, BALKED, customer)
+    for _ in range(barbers):
+        await bench.put(None)
+
+
+async def _work(barber, bench, clock, report):
+    """A barber: longest waiting customer off the bench, cut, repeat until the sentinel
+    """
+    while True:
+        waiting = await bench.get()
+        if waiting is None:
+            break
+        entered, customer = waiting
+        start = clock.now()
+        customer.wait_time = start - entered
+        barber.cut(customer)
+        report(start, CUT_STARTED, barber)
+        end = start + customer.serve_time
+        await clock.until(end)
+        customer.status = "satisfied"
+        report(end, CUT_ENDED, barber)
+        report(end, SERVED, customer)
+        barber.customer, barber.status = None, "Ready"
+    barber.status = "Leaving"
+    report(clock.now(), SHIFT_ENDED, barber)
+
+
+def _ignore(minute, kind, subject):
+    pass
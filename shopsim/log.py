@@ -0,0 +1,81 @@
+"""
+In-memory log of a shop day
+General Approach:
+    * An EventLog is a report callback: hand it to manage_day() and it keeps every event in order
+    * Each line is formatted once, when it happens, together with the names it is about,
+      so views can show any slice of it and filter by customer or barber without going back to the model
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+from .engine import describe
+from .shop import clock
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class EventLog(object):
+    """Append-only list of (minute, kind, names, text) events
+    `t_start` is the opening time, for the HH:MM clock in the text; `skip` holds kinds not worth keeping
+    """
+
+    def __init__(self, t_start=0, skip=()):
+        self.t_start = t_start
+        self.skip = frozenset(skip)
+        self._events = []
+
+    def __len__(self):
+        return len(self._events)
+
+    def __getitem__(self, i):
+        return self._events[i]
+
+    def __call__(self, minute, kind, subject):
+        """Record an event, same signature as the Manager's report callback
+        """
+        if kind in self.skip:
+            return
+        self._events.append((minute, kind, _names(subject), describe(kind, subject, clock(self.t_start + minute))))
+
+    def extend(self, events):
+        """Take in events already recorded by another EventLog (e.g. one filled on a worker thread)
+        """
+        self._events.extend(events)
+
+    def truncate(self, length):
+        """Forget every event from position `length` on
+        """
+        del self._events[length:]
+
+    def text(self, i):
+        return self._events[i][3]
+
+    def lines(self):
+        return [event[3] for event in self._events]
+
+    def matching(self, who, start=0):
+        """Positions from `start` on of the events about a customer or barber whose name contains `who`
+        (case doesn't matter); an empty `who` matches everything
+        """
+        who = who.lower()
+        return [i for i in range(start, len(self._events))
+                if not who or any(who in name.lower() for name in self._events[i][2])]
+
+    def clear(self):
+        del self._events[:]
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def _names(subject):
+    """Who an event is about: the customer, or the barber and whoever is in their chair
+    """
+    if subject is None:
+        return ()
+    customer = getattr(subject, "customer", None)
+    if customer is not None:
+        return subject.name, customer.name
+    return subject.name,
@@ -0,0 +1,175 @@
+"""
+Monte Carlo replications of a shop day
+General Approach:
+    * A DayConfig says what a day looks like, a seed makes it one particular day; run_day() runs it and boils
+      it down to a DaySummary (counts and total times), small enough to ship between processes
+    * replicate() farms seeds out to a process pool and streams summaries back as they finish
+    * Estimates collects summaries one at a time and gives means with confidence intervals across days
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import collections
+import math
+import os
+import random
+
+from .engine import exponential_patience, BALKED, CUT_STARTED, ENTERED, RENEGED, SERVED, TOO_LATE, TURNED_OUT
+from .shop import manage_day, poisson_customers, random_customers, _OPEN_TIME, _CLOSING_TIME
+
+DayConfig = collections.namedtuple("DayConfig", "customers barbers seats t_start t_end patience rate target")
+DayConfig.__new__.__defaults__ = (40, 2, 5, _OPEN_TIME, _CLOSING_TIME, None, None, 15)
+DayConfig.__doc__ = """A kind of day: `barbers` barbers, `seats` waiting places, open t_start..t_end.
+Customers come `rate` an hour at random, or if `rate` is None `customers` of them the way the GUI adds them.
+`patience` is the customers' mean (exponential) patience, None for the fixed default.
+Served customers that waited at most `target` minutes count towards the service level"""
+
+DaySummary = collections.namedtuple("DaySummary", "seed customers served balked reneged turned_out "
+                                                  "mean_time p50_time p90_time "
+                                                  "service_level balk_rate utilization")
+
+## Summary fields that get an estimate
+METRICS = ("served", "balked", "reneged", "turned_out", "mean_time", "p50_time", "p90_time",
+           "service_level", "balk_rate", "utilization")
+
+## Two-sided 95% Student t quantiles by degrees of freedom; past the table the normal 1.96 is close enough
+_T95 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class Estimate(collections.namedtuple("Estimate", "mean low high")):
+    """A mean with its 95% confidence interval"""
+    __slots__ = ()
+
+    def __str__(self):
+        return "{:.2f} [{:.2f}, {:.2f}]".format(*self)
+
+
+class Estimates(object):
+    """Running mean and variance of every metric, one DaySummary at a time (Welford), so replications
+    can be summarized while they stream in without keeping them
+    """
+
+    def __init__(self):
+        self.n = 0
+        self._mean = dict.fromkeys(METRICS, 0.0)
+        self._m2 = dict.fromkeys(METRICS, 0.0)
+
+    def add(self, day):
+        self.n += 1
+        for metric in METRICS:
+            x = getattr(day, metric)
+            delta = x - self._mean[metric]
+            self._mean[metric] += delta / self.n
+            self._m2[metric] += delta * (x - self._mean[metric])
+        return day
+
+    def __getitem__(self, metric):
+        mean = self._mean[metric]
+        if self.n < 2:
+            return Estimate(mean, float("nan"), float("nan"))
+        half = _t95(self.n - 1) * math.sqrt(self._m2[metric] / (self.n - 1) / self.n)
+        return Estimate(mean, mean - half, mean + half)
+
+    def table(self):
+        return {metric: self[metric] for metric in METRICS}
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def run_day(config, seed):
+    """Run one day of `config` with its own random stream and summarize it
+    """
+    rng = random.Random(seed)
+    if config.rate is None:
+        customers = list(random_customers(config.customers, config.t_start, config.t_end, rng))
+    else:
+        customers = list(poisson_customers(config.rate, config.t_start, config.t_end, rng))
+    patience = None if config.patience is None else exponential_patience(config.patience, rng)
+    day = config.t_end - config.t_start
+    counts = collections.Counter()
+    times = []
+    busy = [0]  # Barber-minutes spent cutting before closing
+    on_time = [0]  # Served within the target wait
+
+    def report(minute, kind, subject):
+        counts[kind] += 1
+        if kind == SERVED:
+            times.append(subject.wait_time + subject.serve_time)
+            on_time[0] += subject.wait_time <= config.target
+        elif kind == CUT_STARTED:
+            busy[0] += min(max(subject.cut_time_left, 1), day - minute)
+
+    barbers = ["Barber-{}".format(i + 1) for i in range(config.barbers)]
+    manage_day(customers, barbers, config.seats, config.t_start, config.t_end, report, patience=patience)
+    times.sort()
+    came = counts[ENTERED]
+    balked = counts[BALKED] + counts[TOO_LATE]
+    return DaySummary(seed, len(customers), counts[SERVED], balked, counts[RENEGED],
+                      counts[TURNED_OUT], sum(times) / len(times) if times else 0.0,
+                      _percentile(times, 50), _percentile(times, 90),
+                      on_time[0] / came if came else 1.0, balked / came if came else 0.0,
+                      busy[0] / (config.barbers * day))
+
+
+def seeds(n, seed=42):
+    """`n` seeds for independent days, the same ones for the same `seed`
+    """
+    return ["{}/{}".format(seed, i) for i in range(n)]  # random.Random hashes str seeds (sha512)
+
+
+def replicate(config, n, seed=42, workers=None, chunksize=None):
+    """Run `n` independent days of `config` on `workers` processes (all cores by default), yielding each
+    DaySummary as it finishes (not in seed order)
+    """
+    return (day for _, day in run_days([(config, s) for s in seeds(n, seed)], workers, chunksize))
+
+
+def run_days(jobs, workers=None, chunksize=None):
+    """run_day() for every (config, seed) in `jobs`, spread over a process pool like replicate(),
+    yielding (config, DaySummary) pairs as they finish
+    """
+    jobs = list(jobs)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) < 2:
+        for job in jobs:
+            yield job[0], run_day(*job)
+        return
+    import multiprocessing  # Slow to import, and only needed here
+    ## A few chunks per worker keeps them all busy without paying the pickling per day
+    chunksize = chunksize or max(1, len(jobs) // (workers * 4))
+    pool = multiprocessing.Pool(workers)
+    try:
+        for done in pool.imap_unordered(_run_job, jobs, chunksize):
+            yield done
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _run_job(job):
+    return job[0], run_day(*job)
+
+
+def _percentile(ordered, p):
+    """Nearest-rank percentile of a sorted list, 0 for none
+
+    Examples:
+    >>> _percentile([10, 20, 30, 40], 50)
+    20
+    >>> _percentile([10, 20, 30, 40], 90)
+    40
+    """
+    if not ordered:
+        return 0
+    return ordered[max(0, int(math.ceil(p / 100.0 * len(ordered))) - 1)]
+
+
+def _t95(df):
+    return _T95[df - 1] if df <= len(_T95) else 1.96
@@ -0,0 +1,93 @@
+"""
+Replaying a simulated day at a chosen speed
+General Approach:
+    * The day is simulated up front (milliseconds) and kept as its EventLog; a Playback walks through it
+      against the wall clock at `speed` shop minutes a second (None: as fast as it can be shown)
+    * advance(seconds) is called once per display frame with the time since the last one and hands back
+      every event that came due in between, so the display updates once a frame however many happened
+    * With skip_idle, stretches where nobody is in the shop are jumped over instead of waited out
+    * Who is waiting (in order) and how many are in the shop is kept up to date for the display
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import collections
+
+from .engine import ENTERED, TOO_LATE, BALKED, RENEGED, TURNED_OUT, CUT_STARTED, SERVED
+
+SPEEDS = (1, 10, 1000, None)  # Shop minutes a second; None is as fast as frames go
+_BURST = 200  # Events a frame at full speed
+_LEFT = frozenset((TOO_LATE, BALKED, RENEGED, TURNED_OUT, SERVED))
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class Playback(object):
+    """Plays `events` (an EventLog, or its (minute, kind, names, text) entries) of a day `length` minutes long
+
+    Examples:
+    >>> events = [(0, "opened", (), "open"), (5, ENTERED, ("Ann",), "in"), (30, SERVED, ("Ann",), "out"),
+    ...           (400, ENTERED, ("Bob",), "in")]
+    >>> play = Playback(events, length=480, speed=10)
+    >>> [e[3] for e in play.advance(1.0)], play.minute, play.waiting
+    (['open', 'in'], 10.0, ['Ann'])
+    >>> [e[3] for e in play.advance(2.0)], play.minute
+    (['out'], 30.0)
+    >>> [e[3] for e in play.advance(0.016)], play.minute  # Nobody inside: on to the next arrival
+    (['in'], 400)
+    """
+
+    def __init__(self, events, length=None, speed=1, skip_idle=True, burst=_BURST):
+        self.events = events
+        self.length = length if length is not None else (events[len(events) - 1][0] if len(events) else 0)
+        self.speed = speed
+        self.skip_idle = skip_idle
+        self.burst = burst
+        self.minute = 0  # Shop minutes since opening played so far
+        self.pos = 0  # Next event to play
+        self.inside = 0  # Customers in the shop, waiting or in a chair
+        self._waiting = collections.OrderedDict()  # Names of those waiting, longest waiting first
+
+    @property
+    def waiting(self):
+        return list(self._waiting)
+
+    def done(self):
+        return self.pos >= len(self.events) and self.minute >= self.length
+
+    def advance(self, seconds):
+        """Let `seconds` of wall time pass; returns the events that came due, in order
+        """
+        events, start = self.events, self.pos
+        if self.speed is None:
+            end = min(start + self.burst, len(events))
+            target = events[end - 1][0] if end > start else self.length
+            if end == len(events):
+                target = self.length
+        else:
+            target = self.minute + seconds * self.speed
+            if self.skip_idle and self.inside == 0:
+                ## Nobody to watch: straight on to the next thing that happens (or the end of the day)
+                target = max(target, events[start][0] if start < len(events) else self.length)
+            end = start
+            while end < len(events) and events[end][0] <= target:
+                end += 1
+        played = events[start:end]
+        for event in played:
+            self._play(event)
+        self.pos = end
+        self.minute = min(target, self.length)
+        return played
+
+    def _play(self, event):
+        _, kind, names, _ = event
+        if kind == ENTERED:
+            self.inside += 1
+            self._waiting[names[0]] = True
+        elif kind == CUT_STARTED:
+            self._waiting.pop(names[-1], None)
+        elif kind in _LEFT:
+            self.inside -= 1
+            self._waiting.pop(names[0], None)
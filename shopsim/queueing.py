@@ -0,0 +1,160 @@
+"""
+Analytic M/M/K/L estimates for the shop, no simulation
+General Approach:
+    * Poisson arrivals (`rate` an hour), exponential cuts (`mean_cut` minutes), K barbers and L seats:
+      a customer who finds L people waiting goes away. That is the README's shop in steady state
+      (except L=0: the shop seats everyone in the waiting area first, so there nobody gets in at all,
+      while here it is the plain Erlang loss system)
+    * Probabilities are built from the Erlang B recursion B(k) = a B(k-1) / (k + a B(k-1)), which never
+      overflows, and the waiting states are a geometric tail on top of it (taken from the far end when the
+      shop is overloaded, so big L doesn't overflow either)
+    * Erlang B tables are memoized per offered load and only ever extended, so sweeping K is a lookup
+    * validate() runs the same setups through manage_day() to show how close the numbers are
+
+    python -m shopsim.queueing -k 1 2 3 -l 3 5 --rate 4 6
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import argparse
+import collections
+import random
+
+MEAN_CUT = 20.0  # Minutes, random_customers() / poisson_customers() cuts take 10-30
+
+Steady = collections.namedtuple("Steady", "blocking wait_prob mean_queue mean_wait mean_time utilization throughput")
+Steady.__doc__ = """Steady state of a shop: chance an arriving customer is turned away (blocking) or has to
+wait (wait_prob), mean number waiting, mean wait and time in the shop (minutes, customers who got in),
+share of barber time spent cutting and customers served an hour"""
+
+_erlang_b = {}  # Offered load -> [B(0), B(1), ...]
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def erlang_b(k, load):
+    """Chance all `k` servers are busy in a loss system with `load` Erlangs offered
+
+    Examples:
+    >>> round(erlang_b(2, 1.0), 4)
+    0.2
+    >>> erlang_b(0, 3.0)
+    1.0
+    """
+    table = _erlang_b.get(load)
+    if table is None:
+        table = _erlang_b[load] = [1.0]
+    while len(table) <= k:
+        b = table[-1]
+        table.append(load * b / (len(table) + load * b))
+    return table[k]
+
+
+def mmkl(rate, barbers, seats, mean_cut=MEAN_CUT):
+    """Steady state of an M/M/K/L shop: `rate` customers an hour, cuts of `mean_cut` minutes on average
+
+    Examples:
+    >>> s = mmkl(3.0, 1, 1)  # One barber, one seat, a customer every 20 minutes, 20 minute cuts
+    >>> round(s.blocking, 4), round(s.utilization, 4)
+    (0.3333, 0.6667)
+    """
+    if barbers < 1 or seats < 0:
+        raise ValueError("need at least one barber and no negative seats")
+    load = rate * mean_cut / 60.0  # Erlangs: barbers' worth of work coming in
+    rho = load / barbers
+    b = erlang_b(barbers, load)
+    if b == 0:  # So little work for so many barbers that nobody ever waits (or B underflowed)
+        return Steady(0.0, 0.0, 0.0, 0.0, mean_cut, rho, rate)
+
+    ## Weights relative to "all barbers busy, nobody waiting"; rescaled by rho^-L if the tail grows
+    if rho > 1:
+        top = rho ** -seats
+        below = top / b  # States up to K, all of them
+        tail = [rho ** (j - seats) for j in range(1, seats + 1)]
+        full_only = top
+    else:
+        below = 1.0 / b
+        tail = [rho ** j for j in range(1, seats + 1)]
+        full_only = 1.0
+    total = below + sum(tail)
+    blocking = (tail[-1] if seats else full_only) / total
+    wait_prob = (full_only + sum(tail[:-1])) / total if seats else 0.0
+    mean_queue = sum(j * w for j, w in enumerate(tail, 1)) / total
+    throughput = rate * (1 - blocking)
+    mean_wait = mean_queue / (throughput / 60.0) if throughput else 0.0
+    return Steady(blocking, wait_prob, mean_queue, mean_wait, mean_wait + mean_cut,
+                  throughput * mean_cut / 60.0 / barbers, throughput)
+
+
+def hopeless(config, max_blocking=0.5, mean_cut=MEAN_CUT):
+    """Whether a DayConfig with an arrival rate turns away more than `max_blocking` of its customers
+    in steady state, so it isn't worth simulating (configs without a rate never are)
+    """
+    if config.rate is None:
+        return False
+    return mmkl(config.rate, config.barbers, config.seats, mean_cut).blocking > max_blocking
+
+
+def simulate_steady(rate, barbers, seats, minutes=20000, mean_cut=MEAN_CUT, seed=42):
+    """The same shop run through manage_day() for a long day: Poisson arrivals, exponential cuts
+    (whole minutes), nobody gives up or goes home early. Returns a Steady to hold against mmkl()
+    """
+    from .engine import BALKED, CUT_STARTED, ENTERED, SERVED
+    from .shop import Customer, manage_day
+
+    rng = random.Random(seed)
+    customers, time = [], 0.0
+    while True:
+        time += rng.expovariate(rate / 60.0)
+        if time >= minutes:
+            break
+        customers.append(Customer(len(customers), "Guest", int(time), int(round(rng.expovariate(1 / mean_cut))),
+                                  patience=None))
+    counts = collections.Counter()
+    waits, busy = [], [0]
+
+    def report(minute, kind, subject):
+        counts[kind] += 1
+        if kind == CUT_STARTED:
+            waits.append(subject.customer.wait_time)
+            busy[0] += min(max(subject.cut_time_left, 1), minutes - minute)
+
+    manage_day(customers, [str(i) for i in range(barbers)], seats, 0, minutes, report,
+               shift_len=None, last_entry=None, kick_out=None)
+    came = counts[ENTERED] or 1
+    mean_wait = sum(waits) / len(waits) if waits else 0.0
+    mean_cut_seen = sum(max(c.serve_time, 1) for c in customers) / (len(customers) or 1)
+    return Steady(counts[BALKED] / came, sum(1 for w in waits if w > 0) / came,
+                  sum(waits) / float(minutes), mean_wait, mean_wait + mean_cut_seen,
+                  busy[0] / float(barbers * minutes), counts[SERVED] * 60.0 / minutes)
+
+
+def validate(rates, barbers, seats, minutes=20000, seed=42):
+    """Formula next to simulation for every (rate, K, L), as text lines
+    """
+    lines = ["{:>5} {:>3} {:>3}  {:<11} {:>9} {:>9}".format("rate", "K", "L", "", "analytic", "simulated")]
+    for rate in rates:
+        for k in barbers:
+            for l in seats:
+                formula, sim = mmkl(rate, k, l), simulate_steady(rate, k, l, minutes, seed=seed)
+                for name in ("blocking", "mean_wait", "utilization"):
+                    lines.append("{:>5g} {:>3} {:>3}  {:<11} {:>9.3f} {:>9.3f}".format(
+                        rate, k, l, name, getattr(formula, name), getattr(sim, name)))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="shopsim.queueing", description="M/M/K/L estimates, checked by simulation")
+    parser.add_argument("-k", "--barbers", type=int, nargs="+", default=[2], help="numbers of barbers")
+    parser.add_argument("-l", "--seats", type=int, nargs="+", default=[5], help="waiting area sizes")
+    parser.add_argument("--rate", type=float, nargs="+", default=[4.0], help="customers an hour")
+    parser.add_argument("--minutes", type=int, default=20000, help="length of the simulated day")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    args = parser.parse_args(argv)
+    print(validate(args.rate, args.barbers, args.seats, args.minutes, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Customer schedules as CSV files
+General Approach:
+    * A schedule is one customer per row: id, name, arrival (HH:MM), service (minutes); a header row
+      with those names is optional on the way in and always written on the way out. Files written with
+      the outcome columns read back in as their schedule
+    * Rows are parsed as the file streams past, straight into a CustomerTable (see table), so a 100k row
+      day is a few seconds from file to simulated, with nothing in between
+    * Every row is checked and all the problems are reported together (up to `max_errors` of them,
+      with line numbers), instead of stopping at the first bad row
+    * write_csv() can add the outcome of a run (status, wait, start, end) after the schedule columns
+
+    python -m shopsim --schedule day.csv --export result.csv
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import csv
+import re
+
+from .shop import clock, _PATIENCE
+from .table import CustomerTable, NEVER
+
+FIELDS = ("id", "name", "arrival", "service")
+OUTCOME = ("status", "wait", "start", "end")
+## Hours go past 23 the way clock() writes them for a day running past midnight (24:06 is 00:06 next day)
+_HHMM = re.compile(r"([0-9]{1,4}):([0-5][0-9])$")
+_WHOLE = re.compile(r"[0-9]+")  # ASCII digits only: str.isdigit() takes "²" too, which int() doesn't
+_INT_MAX = 2 ** 31 - 1  # CustomerTable columns are C ints
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class ScheduleError(ValueError):
+    """Bad rows in a schedule; `errors` are (line, message) pairs, `count` how many there were in all
+    """
+
+    def __init__(self, errors, count):
+        self.errors = errors
+        self.count = count
+        lines = ["line {}: {}".format(line, message) for line, message in errors]
+        if count > len(errors):
+            lines.append("... {} more".format(count - len(errors)))
+        super(ScheduleError, self).__init__("{} bad row(s) in schedule\n".format(count) + "\n".join(lines))
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def read_csv(source, table=None, patience=_PATIENCE, max_errors=20):
+    """CustomerTable (a new one, or `table` added to) with every customer in the CSV `source`
+    (path or open file); raises ScheduleError listing the bad rows, if any
+    """
+    table = table if table is not None else CustomerTable()
+    errors, count = [], 0
+    for line, row, error in rows(source):
+        if error is not None:
+            count += 1
+            if len(errors) < max_errors:
+                errors.append((line, error))
+        elif not count:  # Only worth keeping while the file is still good
+            number, name, arrival, service = row
+            table.append(name, arrival, service, patience, number)
+    if count:
+        raise ScheduleError(errors, count)
+    return table
+
+
+def rows(source):
+    """(line, (id, name, arrival minutes, service minutes), error) for each row of `source`, as it is read;
+    row is None when error says what is wrong with it
+
+    Examples:
+    >>> for line, row, error in rows(["id,name,arrival,service", "1,Ann,09:30,20", "2,Bob,9:75,x"]):
+    ...     print(line, row, error)
+    2 (1, 'Ann', 570, 20) None
+    3 None arrival '9:75' is not HH:MM
+    """
+    if isinstance(source, str):
+        with open(source, newline="", encoding="utf-8-sig") as f:  # Excel starts UTF-8 files with a BOM
+            for parsed in rows(f):
+                yield parsed
+        return
+    seen, width = set(), len(FIELDS)
+    reader = csv.reader(source)
+    for fields in reader:
+        line = reader.line_num
+        if not fields or (len(fields) == 1 and not fields[0].strip()):
+            continue  # Blank line
+        if line == 1:
+            header = tuple(field.strip().lower() for field in fields)
+            if header in (FIELDS, FIELDS + OUTCOME):  # Exported files read back in, outcome and all
+                width = len(header)
+                continue
+        if len(fields) != width:
+            yield line, None, "expected {} fields, got {}".format(width, len(fields))
+            continue
+        row, error = _parse(fields[:len(FIELDS)], seen)
+        yield line, row, error
+
+
+def write_csv(table, target, outcome=False):
+    """Write `table` to the CSV `target` (path or open file), with the last run's outcome if `outcome`;
+    read_csv() reads it back, even for a day running past midnight
+
+    Examples:
+    >>> import io
+    >>> from .table import run_table
+    >>> late = CustomerTable()
+    >>> for number, (arrive, serve) in enumerate([(23 * 60 + 40, 30), (23 * 60 + 45, 25), (24 * 60 + 10, 20)]):
+    ...     _ = late.append("Guest {}".format(number), arrive, serve, number=number)
+    >>> _ = run_table(late, ["A"], 2, 22 * 60, 25 * 60, shift_len=None, last_entry=180, kick_out=180)
+    >>> f = io.StringIO()
+    >>> write_csv(late, f, outcome=True)
+    >>> for line in f.getvalue().splitlines():
+    ...     print(line)
+    id,name,arrival,service,status,wait,start,end
+    0,Guest 0,23:40,30,satisfied,0,23:40,24:10
+    1,Guest 1,23:45,25,satisfied,25,24:10,24:35
+    2,Guest 2,24:10,20,satisfied,25,24:35,24:55
+    >>> again = read_csv(io.StringIO(f.getvalue()))
+    >>> list(again.arrive) == list(late.arrive), list(again.serve) == list(late.serve)
+    (True, True)
+    """
+    if isinstance(target, str):
+        with open(target, "w", newline="", encoding="utf-8") as f:
+            return write_csv(table, f, outcome)
+    writer = csv.writer(target)
+    writer.writerow(FIELDS + OUTCOME if outcome else FIELDS)
+    for i in range(len(table)):
+        row = [table.number[i], table.given_name(i), clock(table.arrive[i]), table.serve[i]]
+        if outcome:
+            row += [table.status_text(i), table.wait[i], _clock_or_blank(table.start[i]),
+                    _clock_or_blank(table.end[i])]
+        writer.writerow(row)
+
+
+def whole_number(text):
+    """`text` as a whole number if it is one a CustomerTable can hold (ASCII digits, up to 2**31 - 1), else None
+
+    Examples:
+    >>> whole_number("42"), whole_number("²"), whole_number("2147483648"), whole_number("-1")
+    (42, None, None, None)
+    """
+    if _WHOLE.fullmatch(text) is None:
+        return None
+    number = int(text)
+    return number if number <= _INT_MAX else None
+
+
+def _parse(fields, seen):
+    """(id, name, arrival, service) from a row's four fields and None, or None and what is wrong with them
+    """
+    fields = [field.strip() for field in fields]
+    number, name, arrival, service = whole_number(fields[0]), fields[1], fields[2], whole_number(fields[3])
+    if number is None:
+        return None, "id {!r} is not a whole number up to {}".format(fields[0], _INT_MAX)
+    if number in seen:
+        return None, "id {} appears twice".format(number)
+    if not name:
+        return None, "name is empty"
+    time = _HHMM.match(arrival)
+    if time is None:
+        return None, "arrival {!r} is not HH:MM".format(arrival)
+    if service is None:
+        return None, "service {!r} is not a whole number of minutes up to {}".format(fields[3], _INT_MAX)
+    seen.add(number)
+    return (number, name, int(time.group(1)) * 60 + int(time.group(2)), service), None
+
+
+def _clock_or_blank(minutes):
+    return "" if minutes == NEVER else clock(minutes)
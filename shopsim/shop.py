@@ -0,0 +1,245 @@
+"""
+The barber shop model, without any GUI
+General Approach:
+    * Customer, WaitingArea and Barber each have a proceed(minutes) method that lets that many minutes pass
+      in their world; the Manager (see engine) decides when to call it
+    * Times are minutes since midnight for customers (arrive_time) and opening hours,
+      minutes since opening for everything the Manager reports
+    * open_shop() wires a day together, manage_day() runs it
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import random
+from collections import deque
+
+from .engine import Manager
+
+_CUSTOMER_TEMPLATE = "Customer-{:d}:{:s}"
+_OPEN_TIME = 9 * 60  # Minutes
+_SHIFT_LEN = 60 * 4  # Minutes
+_CLOSING_TIME = 17 * 60  # Minutes
+_LAST_ENTRY = 2 * _SHIFT_LEN  # Minutes after opening, later customers are sent away
+_PATIENCE = 30  # Minutes a customer waits before giving up
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class Customer(object):
+    def __repr__(self):
+        return """{} - status '{}', waiting {} minutes""".format(self.name, self.status, self.wait_time)
+
+    def __init__(self, customer_number, name, arrive_time, serve_time, patience=_PATIENCE):
+        self.name = _CUSTOMER_TEMPLATE.format(customer_number, name)
+        self.status = 'Waiting'
+        self.patience = patience  # Minutes, None waits forever
+        self.arrive_time = arrive_time  # 到达时间
+        self.serve_time = serve_time  # 服务时间
+        self.wait_time = 0
+
+    def proceed(self, minutes=1):
+        self.wait_time += minutes
+
+        ## Customer is triggered after waiting longer than their patience!
+        if self.status == "Waiting" and self.patience is not None and self.wait_time > self.patience:
+            self.status = "unfulfilled"
+
+
+class WaitingArea(object):
+    """FIFO customer queue object, bounded to MAX_SIZE customers
+    [(waiting a long time) ... (waiting) ... (recently arrived)]
+    Customers leaving from the middle are only marked gone and dropped once they reach the front,
+    so adding, seating and removing customers are all O(1) (amortized), however long the line
+    """
+
+    def __init__(self, MAX_SIZE=0):
+        self._line = deque()
+        self._gone = set()
+        self._MAX_CUSTOMERS = MAX_SIZE
+
+    def __len__(self):
+        return len(self._line) - len(self._gone)
+
+    def __iter__(self):
+        """Waiting customers, longest waiting first
+        """
+        for customer in self._line:
+            if customer not in self._gone:
+                yield customer
+
+    def add_customer(self, customer):
+        """Add customer to waiting area if there is room. Otherwise send back to management
+        """
+        ## If shop is full, return customer to management
+        if len(self) >= self._MAX_CUSTOMERS:
+            customer.status = "impatient"
+            return customer
+
+        ## Add to waiting area
+        self._line.append(customer)
+
+    def get_patient_customer(self):
+        """Returns longest waiting customer
+        """
+        while self._line[0] in self._gone:
+            self._gone.remove(self._line.popleft())
+        return self._line.popleft()
+
+    def remove_customer(self, customer):
+        """Take a customer out of the line, wherever they are in it
+        """
+        self._gone.add(customer)
+        ## Mostly gone people in line? Sweep them out in one go
+        if len(self._gone) > len(self):
+            self._line = deque(self)
+            self._gone.clear()
+
+    def proceed(self, minutes=1, closed=False):
+        """Simulate time
+        * Have each customer wait a minute
+        * If they've been waiting for too long, or the shop has `closed`, boot em back out to management
+        """
+        rejects = []
+        for customer in reversed(list(self)):
+            customer.proceed(minutes)
+            if customer.status == "unfulfilled":
+                rejects.append(customer)
+            ## Closing time, kick em all out
+            elif closed:
+                customer.status = "furious"
+                rejects.append(customer)
+        for customer in rejects:
+            self.remove_customer(customer)
+        return rejects
+
+
+class Barber(object):
+    """Barber gets instantiated at begining of shift. Cuts hair until his shift is done. Standard fare
+    Going home at closing time is up to the Manager; `shift_len` None works until then
+    """
+
+    def __init__(self, name, shift_len=_SHIFT_LEN):
+        self.name = name
+        self.shift_len = shift_len
+        self.cut_time_left = 0
+        self.time_on_shift = 0
+        self.status = "Ready"  # Ready, Cutting, Done, Leaving
+        self.customer = None
+
+    def cut(self, customer):
+        """Start cutting a new customer's hair.
+        """
+        if self.status != "Ready":
+            return "WOAH! Management screwed up, you can't give a barber a customer when they're already with one"
+        ## The customer said how long it takes
+        self.cut_time_left = customer.serve_time
+        self.customer = customer
+        self.status = "Cutting"
+
+    def proceed(self, minutes=1):
+        """Simulate time
+        Proceed `minutes`:
+            * Cut hair if cutting
+            * Tell manager you're done if the haircut is finished
+            * Go home if no customer and theyve been working long enough
+        """
+        self.time_on_shift += minutes
+
+        ## Cut hair if you have a customer
+        if self.customer is not None:
+            self.cut_time_left -= minutes
+            if self.cut_time_left <= 0:
+                self.status = "Done"
+                self.customer.status = "satisfied"
+        elif self.shift_len is not None and self.time_on_shift > self.shift_len:
+            self.status = "Leaving"
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def clock(minutes):
+    """Format `minutes` into HH:MM string
+
+    Examples:
+    >>> clock(30)
+    '00:30'
+    >>> clock(150)
+    '02:30'
+    """
+    return "{:0>2d}:{:0>2d}".format(minutes // 60, minutes % 60)
+
+
+def unclock(time):
+    """Format HH:MM string into `minutes`
+
+    Examples:
+    >>> unclock("09:30")
+    570
+    """
+    s = time.split(":")
+    return int(s[0]) * 60 + int(s[1])
+
+
+def open_shop(customers, barbers, seats, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, report=None,
+              shift_len=_SHIFT_LEN, last_entry=_LAST_ENTRY, kick_out=_LAST_ENTRY, patience=None, stats=None):
+    """Get a day ready to run: a Manager for `barbers` (names) and `seats` waiting places, open t_start..t_end
+    `customers` are sorted by arrive_time; `report(minute, kind, subject)` hears about everything that happens;
+    `stats`, a PhaseStats (see instrument), times the day's phases
+    """
+    day = t_end - t_start
+    return _with_arrivals(
+        Manager([Barber(name, shift_len) for name in barbers], WaitingArea(MAX_SIZE=seats),
+                report if report is not None else _ignore,
+                until=day, closing=day, shift_len=shift_len, last_entry=last_entry, kick_out=kick_out,
+                patience=patience, stats=stats),
+        customers, t_start)
+
+
+def manage_day(customers, barbers, seats, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, report=None, **settings):
+    """This is the manager's job. Watch the clock and take care of customers
+    0. Clear out impatient customers from the waiting area
+    1. Usher new customers into the waiting area
+    2. Check on the barbers, see if they are done with a customer
+    3. Get customer from waiting area into that seat!
+    Runs the whole day (see open_shop) and returns its Manager
+    """
+    manager = open_shop(customers, barbers, seats, t_start, t_end, report, **settings)
+    manager.run()
+    return manager
+
+
+def random_customers(count, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, rng=random):
+    """Up to `count` customers the way the GUI's add button makes them: each one turns up within an hour of
+    the previous one (until closing time) and wants a 10-30 minute cut
+    """
+    current_time = t_start
+    for number in range(count):
+        if current_time >= t_end:
+            return
+        current_time = rng.randint(current_time, current_time + 60)
+        yield Customer(number, "Guest {}".format(number), current_time, rng.randint(10, 30))
+
+
+def poisson_customers(rate, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, rng=random):
+    """Customers turning up at random, `rate` an hour on average (exponential gaps, whole minutes),
+    each wanting a 10-30 minute cut
+    """
+    time, number = float(t_start), 0
+    while True:
+        time += rng.expovariate(rate / 60.0)
+        if time >= t_end:
+            return
+        yield Customer(number, "Guest {}".format(number), int(time), rng.randint(10, 30))
+        number += 1
+
+
+def _with_arrivals(manager, customers, t_start):
+    manager.add_arrivals((customer.arrive_time - t_start, customer) for customer in customers)
+    return manager
+
+
+def _ignore(minute, kind, subject):
+    pass
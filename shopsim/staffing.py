@@ -0,0 +1,325 @@
+"""
+Shift schedules with the fewest staffed hours that still meet a service level, found by simulating
+General Approach:
+    * A schedule is a set of Shifts (start, length: minutes since opening), one barber each; the headcount at
+      any time is how many shifts cover it. BarberShop.py's day is four barbers (_SHIFT_1) handing over to four
+      more (_SHIFT_2) after _SHIFT_LEN, which is HANDOFF here and where the search starts by default
+    * A schedule is judged on a fixed sample of days, the same customers for every schedule so they are
+      compared on the same days: at least `level` of all the customers get their cut started within `wait`
+      minutes and at most `lost` of them leave without one (balked, too late, gave up, turned out, still
+      waiting at closing)
+    * Local search: each step tries every schedule one move away (drop a shift, or take a slot off either end
+      of one) and takes the one with the fewest hours that still meets the SLA, until none does
+    * Most candidates never get simulated. Schedules seen before are in a cache keyed by their sorted shifts.
+      A schedule that never has more barbers on than one that failed is taken to fail as well (a barber less
+      doesn't help) and is skipped; a step tries its smallest cuts first so their failures rule out the
+      bigger ones. And a schedule being simulated is given up at the first customer past what the SLA allows,
+      usually a day or two into the sample
+    * What is left of a step goes to a process pool in one go; the pool gets the sample days once, when it
+      starts (like fork's snapshot), and is kept for the whole search
+    * A week is seven separate days (the shop closes every night), each optimized on its own samples
+
+    rng = random.Random(7)
+    week = [[list(arrivals.customers(arrivals.profile(rates, rng=rng), rng)) for _ in range(20)] for rates in days]
+    for plan in optimize_week(week, SLA(wait=15, level=0.8, lost=0.05)):
+        print(plan.hours, headcount(plan.shifts))
+
+    python -m shopsim.staffing --rates 4 6 10 12 10 6 6 8 --days 7 -r 20
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import argparse
+import collections
+import os
+import random
+
+from .arrivals import customers, profile
+from .engine import CLOSED, TOO_LATE, BALKED, RENEGED, TURNED_OUT, CUT_STARTED
+from .shop import Barber, Customer, clock, open_shop, _OPEN_TIME, _CLOSING_TIME, _SHIFT_LEN
+
+Shift = collections.namedtuple("Shift", "start length")
+Shift.__doc__ = """One barber on from `start` (minutes since opening) for `length` minutes"""
+
+SLA = collections.namedtuple("SLA", "wait level lost")
+SLA.__new__.__defaults__ = (15, 0.8, 0.05)
+SLA.__doc__ = """At least `level` of the customers have their cut started within `wait` minutes,
+at most `lost` of them leave without one"""
+
+## `level` and `lost` are shares of all the customers on the days run, `days` how many were: fewer than the
+## sample if it was given up early, in which case `ok` is False
+Evaluation = collections.namedtuple("Evaluation", "shifts hours ok level lost days")
+
+HANDOFF = (Shift(0, _SHIFT_LEN),) * 4 + (Shift(_SHIFT_LEN, _SHIFT_LEN),) * 4  # _SHIFT_1, then _SHIFT_2
+_SLOT = 60  # Minutes shifts start and end on
+_SHORTEST = 2 * 60  # Minutes
+_LOST = frozenset((TOO_LATE, BALKED, RENEGED, TURNED_OUT))
+
+## Sample days as (arrive_time, serve_time, patience) tuples, and what the shop looks like
+_Demand = collections.namedtuple("_Demand", "days sla seats t_start t_end settings")
+
+_DEMAND = None  # The _Demand a pool worker process evaluates schedules against
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class _Rejected(Exception):
+    """More customers missed than the SLA allows; no need to run the rest"""
+
+
+class _Score(object):
+    """Report callback counting customers who miss the SLA, over all the sample days
+    """
+
+    def __init__(self, wait, misses, lost):
+        self.wait = wait
+        self.max_misses = misses
+        self.max_lost = lost
+        self.misses = self.lost = 0
+        self.manager = None  # Today's, for who is still waiting at closing
+
+    def __call__(self, minute, kind, subject):
+        if kind in _LOST:
+            self.misses += 1
+            self.lost += 1
+        elif kind == CUT_STARTED:
+            if subject.customer.wait_time <= self.wait:
+                return
+            self.misses += 1
+        elif kind == CLOSED:
+            left = len(self.manager.waiting_area)
+            self.misses += left
+            self.lost += left
+        else:
+            return
+        if self.misses > self.max_misses or self.lost > self.max_lost:
+            raise _Rejected()
+
+
+class ShiftOptimizer(object):
+    """Searches shift schedules for one kind of day. `days` are samples of it (lists of Customers, or anything
+    with arrive_time, serve_time and patience), the shop open t_start..t_end with `seats` waiting places;
+    shifts start and end on `slot` minutes and last at least `shortest`. The cache and what is known to fail
+    stay between optimize() calls; close() stops the worker processes
+    """
+
+    def __init__(self, days, sla=SLA(), seats=5, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, slot=_SLOT,
+                 shortest=_SHORTEST, workers=None, **settings):
+        self.length = t_end - t_start
+        if slot <= 0 or self.length % slot:
+            raise ValueError("the day ({} minutes) has to split into slots of {}".format(self.length, slot))
+        self.demand = _Demand(
+            tuple(tuple(sorted((c.arrive_time, c.serve_time, c.patience) for c in day
+                               if t_start <= c.arrive_time < t_end)) for day in days),
+            sla, seats, t_start, t_end, settings)
+        self.slot = slot
+        self.shortest = shortest
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = {}  # Sorted shifts -> Evaluation
+        self.runs = self.hits = self.pruned = 0  # Schedules simulated, found in the cache, ruled out
+        self._failed = []  # Headcounts of failed schedules, none of them below another
+        self._pool = None
+
+    def optimize(self, start=HANDOFF):
+        """Take hours off `start` (Shifts) while the SLA holds; returns the best schedule's Evaluation.
+        Raises ValueError if `start` doesn't meet the SLA itself
+        """
+        start = tuple(sorted(Shift(*shift) for shift in start))
+        for shift in start:
+            if (shift.start % self.slot or shift.length % self.slot or shift.start < 0 or shift.length <= 0
+                    or shift.start + shift.length > self.length):
+                raise ValueError("{} isn't a shift of whole {} minute slots within the day".format(shift, self.slot))
+        best = self.evaluate([start])[0]
+        if not best.ok:
+            raise ValueError("the starting schedule doesn't meet the SLA: {}".format(best))
+        while True:
+            found = None
+            for wave in self._waves(best.shifts):
+                for evaluation in self.evaluate(wave):
+                    if evaluation is not None and evaluation.ok and (found is None or _rank(evaluation) < _rank(found)):
+                        found = evaluation
+            if found is None:
+                return best
+            best = found
+
+    def evaluate(self, candidates):
+        """Evaluation of each schedule in `candidates`, None for those ruled out without simulating
+        """
+        keys = [tuple(sorted(shifts)) for shifts in candidates]
+        todo = []
+        for key in keys:
+            if key in self.cache:
+                self.hits += 1
+            elif self._dominated(key):
+                self.pruned += 1
+            else:
+                todo.append(key)
+        todo = list(collections.OrderedDict.fromkeys(todo))
+        for evaluation in self._map(todo):
+            self.runs += 1
+            self.cache[evaluation.shifts] = evaluation
+            if not evaluation.ok:
+                self._fail(evaluation.shifts)
+        return [self.cache.get(key) for key in keys]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def _waves(self, shifts):
+        """Schedules one move away from `shifts`, grouped by hours, most hours (smallest cut) first
+        """
+        moves = set()
+        for i, shift in enumerate(shifts):
+            rest = shifts[:i] + shifts[i + 1:]
+            moves.add(rest)
+            if shift.length - self.slot >= self.shortest:
+                moves.add(tuple(sorted(rest + (Shift(shift.start, shift.length - self.slot),))))
+                moves.add(tuple(sorted(rest + (Shift(shift.start + self.slot, shift.length - self.slot),))))
+        waves = collections.defaultdict(list)
+        for move in sorted(moves):
+            waves[_hours(move)].append(move)
+        return [waves[hours] for hours in sorted(waves, reverse=True)]
+
+    def _dominated(self, shifts):
+        count = headcount(shifts, self.length, self.slot)
+        return any(all(mine <= theirs for mine, theirs in zip(count, failed)) for failed in self._failed)
+
+    def _fail(self, shifts):
+        count = headcount(shifts, self.length, self.slot)
+        self._failed = [failed for failed in self._failed if not all(f <= c for f, c in zip(failed, count))]
+        self._failed.append(count)
+
+    def _map(self, schedules):
+        if self.workers == 1 or len(schedules) < 2:
+            return [_evaluate(self.demand, shifts) for shifts in schedules]
+        if self._pool is None:
+            import multiprocessing  # Slow to import, and only needed here
+            self._pool = multiprocessing.Pool(self.workers, _adopt, (self.demand,))
+        ## Rejected schedules take a fraction of the time of the rest, so hand them out one at a time
+        return list(self._pool.imap_unordered(_evaluate_adopted, schedules))
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def optimize_week(week, sla=SLA(), start=HANDOFF, **settings):
+    """ShiftOptimizer(days).optimize(start) for each day's samples in `week` (see ShiftOptimizer for the
+    settings); returns the best Evaluation of each day, in order
+    """
+    plans = []
+    for days in week:
+        optimizer = ShiftOptimizer(days, sla, **settings)
+        try:
+            plans.append(optimizer.optimize(start))
+        finally:
+            optimizer.close()
+    return plans
+
+
+def headcount(shifts, length=_CLOSING_TIME - _OPEN_TIME, slot=_SLOT):
+    """Barbers on in each `slot` of a `length` minute day (a shift counts in every slot it touches)
+
+    Examples:
+    >>> headcount(HANDOFF, slot=120)
+    [4, 4, 4, 4]
+    >>> headcount([Shift(0, 120), Shift(60, 180)], 240)
+    [1, 2, 1, 1]
+    """
+    count = [0] * (-(-length // slot))
+    for start, shift_len in shifts:
+        for i in range(start // slot, min(-(-(start + shift_len) // slot), len(count))):
+            count[i] += 1
+    return count
+
+
+def _hours(shifts):
+    return sum(shift.length for shift in shifts) / 60.0
+
+
+def _rank(evaluation):
+    """Fewest hours, then the best service; the shifts settle any tie the same way whatever order they came in
+    """
+    return evaluation.hours, evaluation.lost - evaluation.level, evaluation.shifts
+
+
+def _evaluate(demand, shifts):
+    """Run `shifts` through the sample days, giving up as soon as the SLA can't be met any more
+    """
+    sla = demand.sla
+    total = sum(len(day) for day in demand.days)
+    score = _Score(sla.wait, int((1 - sla.level) * total + 1e-9), int(sla.lost * total + 1e-9))
+    ran = 0
+    try:
+        for day in demand.days:
+            _run_day(demand, shifts, day, score)
+            ran += 1
+    except _Rejected:
+        return Evaluation(shifts, _hours(shifts), False, None, None, ran)
+    return Evaluation(shifts, _hours(shifts), True, 1 - score.misses / float(total) if total else 1.0,
+                      score.lost / float(total) if total else 0.0, ran)
+
+
+def _run_day(demand, shifts, day, score):
+    length = demand.t_end - demand.t_start
+    settings = dict(last_entry=length, kick_out=length)
+    settings.update(demand.settings)
+    guests = [Customer(number, "", arrive, serve, patience) for number, (arrive, serve, patience) in enumerate(day)]
+    manager = open_shop(guests, (), demand.seats, demand.t_start, demand.t_end, score, shift_len=None, **settings)
+    score.manager = manager
+    ## Barbers clock in as the day gets to their shift; each goes home once idle after their own length
+    for number, shift in enumerate(shifts):
+        manager.run(stop=shift.start)
+        manager.add_barber(Barber("Barber-{}".format(number + 1), shift.length), shift.start)
+    manager.run()
+
+
+def _adopt(demand):
+    global _DEMAND
+    _DEMAND = demand
+
+
+def _evaluate_adopted(shifts):
+    return _evaluate(_DEMAND, shifts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="shopsim.staffing",
+                                     description="Fewest staffed hours meeting a service level, day by day")
+    parser.add_argument("--rates", type=float, nargs="+", default=[6.0],
+                        help="customers an hour, one figure per hour from opening (the last one holds)")
+    parser.add_argument("--days", type=int, default=1, help="days to plan, each with its own random customers")
+    parser.add_argument("-r", "--replications", type=int, default=20, help="sample days to judge a schedule on")
+    parser.add_argument("-l", "--seats", type=int, default=5, help="waiting places")
+    parser.add_argument("--wait", type=int, default=15, help="SLA: cut started within this many minutes ...")
+    parser.add_argument("--level", type=float, default=0.8, help="... for at least this share of customers")
+    parser.add_argument("--lost", type=float, default=0.05, help="SLA: at most this share leave without a cut")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="processes (all cores)")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    rates = [(_OPEN_TIME + 60 * hour, rate) for hour, rate in enumerate(args.rates)]
+    week = [[list(customers(profile(rates, rng=rng), rng)) for _ in range(args.replications)]
+            for _ in range(args.days)]
+    sla = SLA(args.wait, args.level, args.lost)
+    for number, days in enumerate(week):
+        optimizer = ShiftOptimizer(days, sla, args.seats, workers=args.workers)
+        try:
+            plan = optimizer.optimize()
+        finally:
+            optimizer.close()
+        shifts = ", ".join("{}-{}".format(clock(_OPEN_TIME + start), clock(_OPEN_TIME + start + shift_len))
+                           for start, shift_len in plan.shifts)
+        print("day {}: {:g} hours, {:.0%} on time, {:.1%} lost  [{}]".format(
+            number + 1, plan.hours, plan.level, plan.lost, shifts))
+        print("    barbers by hour {}; {} simulated, {} from the cache, {} ruled out".format(
+            headcount(plan.shifts), optimizer.runs, optimizer.hits, optimizer.pruned))
+
+
+if __name__ == "__main__":
+    main()
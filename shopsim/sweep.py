@@ -0,0 +1,172 @@
+"""
+Parameter sweeps over shop setups, for staffing decisions
+General Approach:
+    * A sweep is a list of DayConfigs (grid() makes the cartesian product of the values to try),
+      each run for the same R seeds, so configurations are compared on the same days
+    * Every (config, seed) DaySummary is cached on disk, one JSON file per config; re-running a grown grid
+      or with more replications only runs the days that aren't there yet
+    * Whatever is missing for the whole sweep goes to the process pool in one go (see montecarlo.run_days)
+    * With `max_blocking`, configs the M/M/K/L formula already says turn too many customers away
+      (see queueing.hopeless) are left out without simulating them
+
+    python -m shopsim.sweep -k 1 2 3 -l 3 5 --hours 09:00-17:00 10:00-18:00 --rate 4 6 8 -r 200
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import argparse
+import hashlib
+import itertools
+import json
+import os
+
+from .montecarlo import DayConfig, DaySummary, Estimates, run_days, seeds
+from .queueing import hopeless
+from .shop import clock, unclock
+
+CACHE_DIR = ".shopsim-cache"
+_CACHE_VERSION = 1  # Bump when the model changes what a (config, seed) day comes out as
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class DayCache(object):
+    """(config, seed) -> DaySummary, kept in `directory` (None keeps it in memory only)
+    """
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        self._days = {}  # Config -> {seed: DaySummary}
+        self._dirty = set()
+
+    def get(self, config, seed):
+        return self._load(config).get(seed)
+
+    def put(self, config, day):
+        self._load(config)[day.seed] = day
+        self._dirty.add(config)
+
+    def save(self):
+        if self.directory is None:
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        for config in self._dirty:
+            path = self._path(config)
+            with open(path + ".tmp", "w") as f:
+                json.dump({"version": _CACHE_VERSION, "config": list(config),
+                           "days": [list(day) for day in self._days[config].values()]}, f)
+            os.replace(path + ".tmp", path)
+        self._dirty.clear()
+
+    def _load(self, config):
+        days = self._days.get(config)
+        if days is None:
+            days = self._days[config] = {}
+            path = self._path(config) if self.directory is not None else None
+            if path is not None and os.path.exists(path):
+                with open(path) as f:
+                    stored = json.load(f)
+                ## Fields added to DaySummary since make the file stale, run those days again
+                if stored["version"] == _CACHE_VERSION and list(config) == stored["config"]:
+                    for fields in stored["days"]:
+                        if len(fields) == len(DaySummary._fields):
+                            days[fields[0]] = DaySummary(*fields)
+        return days
+
+    def _path(self, config):
+        key = json.dumps([_CACHE_VERSION] + list(config))
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def grid(**values):
+    """Every combination of the DayConfig fields given as lists (other fields keep their defaults)
+
+    Examples:
+    >>> [(c.barbers, c.seats) for c in grid(barbers=[1, 2], seats=[3, 5])]
+    [(1, 3), (1, 5), (2, 3), (2, 5)]
+    """
+    names = list(values)
+    return [DayConfig(**dict(zip(names, combo))) for combo in itertools.product(*(values[n] for n in names))]
+
+
+def sweep(configs, replications, seed=42, workers=None, cache=None, max_blocking=None):
+    """Estimates for each of `configs` over the same `replications` seeds, as (config, Estimates) pairs
+    in the order given. `cache` is a DayCache (default: one in CACHE_DIR).
+    Configs pruned by `max_blocking` come back with None instead of Estimates
+    """
+    cache = cache if cache is not None else DayCache()
+    configs = list(configs)
+    pruned = set(config for config in configs if max_blocking is not None and hopeless(config, max_blocking))
+    days = seeds(replications, seed)
+    missing = [(config, s) for config in configs if config not in pruned
+               for s in days if cache.get(config, s) is None]
+    try:
+        for config, day in run_days(missing, workers):
+            cache.put(config, day)
+    finally:
+        cache.save()  # Keep what got done, even if interrupted
+    results = []
+    for config in configs:
+        if config in pruned:
+            results.append((config, None))
+            continue
+        estimates = Estimates()
+        for s in days:
+            estimates.add(cache.get(config, s))
+        results.append((config, estimates))
+    return results
+
+
+def table(results, metrics=("service_level", "balk_rate", "utilization", "mean_time")):
+    """Text table of a sweep: one line per config with the mean and 95% interval of each metric
+    """
+    lines = ["{:>3} {:>3} {:>11} {:>6}  ".format("K", "L", "hours", "rate") +
+             "  ".join("{:<22}".format(metric) for metric in metrics)]
+    for config, estimates in results:
+        rate = "-" if config.rate is None else "{:g}".format(config.rate)
+        line = "{:>3} {:>3} {:>11} {:>6}  ".format(
+            config.barbers, config.seats, "{}-{}".format(clock(config.t_start), clock(config.t_end)), rate)
+        if estimates is None:
+            lines.append(line + "(pruned, turns too many customers away)")
+        else:
+            lines.append(line + "  ".join("{:<22}".format(str(estimates[metric])) for metric in metrics))
+    return "\n".join(line.rstrip() for line in lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="shopsim.sweep", description="Sweep K, L, opening hours and arrival rate")
+    parser.add_argument("-k", "--barbers", type=int, nargs="+", default=[2], help="numbers of barbers to try")
+    parser.add_argument("-l", "--seats", type=int, nargs="+", default=[5], help="waiting area sizes to try")
+    parser.add_argument("--hours", nargs="+", default=["09:00-17:00"], help="opening hours to try, HH:MM-HH:MM")
+    parser.add_argument("--rate", type=float, nargs="+", default=[None],
+                        help="customers an hour to try (default: the GUI's random customers)")
+    parser.add_argument("-n", "--customers", type=int, default=40, help="customers a day when no --rate")
+    parser.add_argument("--target", type=int, default=15, help="service level: served within this many minutes")
+    parser.add_argument("-r", "--replications", type=int, default=100, help="days per configuration")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="processes (all cores)")
+    parser.add_argument("--cache", default=CACHE_DIR, help="cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="don't read or write the cache")
+    parser.add_argument("--max-blocking", type=float, default=None,
+                        help="skip configs whose M/M/K/L blocking probability is above this")
+    args = parser.parse_args(argv)
+
+    hours = []
+    for span in args.hours:
+        start, _, end = span.partition("-")
+        hours.append((unclock(start), unclock(end)))
+    configs = [DayConfig(customers=args.customers, barbers=k, seats=l, t_start=start, t_end=end, rate=rate,
+                         target=args.target)
+               for k, l, (start, end), rate in itertools.product(args.barbers, args.seats, hours, args.rate)]
+    cache = DayCache(None if args.no_cache else args.cache)
+    print(table(sweep(configs, args.replications, args.seed, args.workers, cache, args.max_blocking)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Columnar customer store, for days with a great many customers
+General Approach:
+    * A CustomerTable keeps one typed array per field (arrival, cut, patience, wait, start, end, status code)
+      instead of one Customer object each: about 30 bytes a customer rather than several hundred
+    * Names are interned: the table holds each distinct name once and a number per customer, and only
+      formats the Customer-<n>:<name> label when someone asks for it
+    * run_table() feeds a table to the Manager by index (see TableCursor); a Customer object is only made when
+      someone walks in and dropped once they have left, with the outcome written back into the columns,
+      so at most K + L + (those arriving that minute) customers exist as objects at any time
+    * Statuses are small ints (STATUSES has the Customer status strings they stand for)
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import itertools
+from array import array
+
+from .engine import (CLOSED, CUT_STARTED, ENTERED, TOO_LATE, BALKED, RENEGED, TURNED_OUT, SERVED)
+from .shop import Customer, open_shop, _CUSTOMER_TEMPLATE, _OPEN_TIME, _CLOSING_TIME, _PATIENCE
+
+## Status codes, in the order of the Customer status strings in STATUSES
+WAITING = 0  # Not come in yet, or still in the shop at closing
+SATISFIED = 1  # Served
+UNFULFILLED = 2  # Gave up waiting
+FURIOUS = 3  # Turned out at closing
+IMPATIENT = 4  # Waiting area was full
+TOO_LATE_STATUS = 5  # Came after last entry
+STATUSES = ("Waiting", "satisfied", "unfulfilled", "furious", "impatient", "cursing himself")
+_CODES = dict((status, code) for code, status in enumerate(STATUSES))
+
+NEVER = -1  # Start / end of a customer who never sat in the chair or never left it
+_FOREVER = -1  # Patience of a customer who never gives up
+_COLUMNS = ("number", "name_id", "arrive", "serve", "patience", "wait", "start", "end", "status")
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class CustomerTable(object):
+    """Customers as columns: `arrive`, `serve`, `number`, `name_id`, `patience` (_FOREVER for None),
+    and the outcome of the last run: `wait`, `start`, `end` (minutes since midnight, NEVER) and `status` codes
+    """
+
+    def __init__(self):
+        self.number = array("i")
+        self.name_id = array("i")
+        self.arrive = array("i")
+        self.serve = array("i")
+        self.patience = array("i")
+        self.wait = array("i")
+        self.start = array("i")
+        self.end = array("i")
+        self.status = array("b")
+        self._names = []  # name_id -> name
+        self._name_ids = {}  # name -> name_id
+
+    def __len__(self):
+        return len(self.arrive)
+
+    def append(self, name, arrive_time, serve_time, patience=_PATIENCE, number=None):
+        """Add a customer (same fields as Customer), return their index. `number` defaults to the index
+        """
+        index = len(self.arrive)
+        self.number.append(index if number is None else number)
+        self.name_id.append(0)
+        self.set_name(index, name)
+        self.arrive.append(arrive_time)
+        self.serve.append(serve_time)
+        self.patience.append(_FOREVER if patience is None else patience)
+        self.wait.append(0)
+        self.start.append(NEVER)
+        self.end.append(NEVER)
+        self.status.append(WAITING)
+        return index
+
+    def extend(self, customers):
+        """Add Customer-like objects (customer_number is taken from the `Customer-<n>:` label)
+        """
+        for customer in customers:
+            label, _, name = customer.name.partition(":")
+            self.append(name, customer.arrive_time, customer.serve_time, customer.patience,
+                        int(label.rpartition("-")[2]))
+        return self
+
+    def name(self, index):
+        """Customer-<n>:<name> label, as Customer would have it
+        """
+        return _CUSTOMER_TEMPLATE.format(self.number[index], self._names[self.name_id[index]])
+
+    def given_name(self, index):
+        """Just the name, without the Customer-<n>: label
+        """
+        return self._names[self.name_id[index]]
+
+    def set_name(self, index, name):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        self.name_id[index] = name_id
+
+    def status_text(self, index):
+        return STATUSES[self.status[index]]
+
+    def customer(self, index):
+        """A Customer for row `index`, as it was when they came in
+        """
+        patience = self.patience[index]
+        customer = Customer(self.number[index], self._names[self.name_id[index]], self.arrive[index],
+                            self.serve[index], None if patience == _FOREVER else patience)
+        customer.row = index
+        return customer
+
+    def order(self):
+        """Indices by arrival time (stable), or a range when the table already is in that order
+        """
+        arrive = self.arrive
+        if all(arrive[i] <= arrive[i + 1] for i in range(len(arrive) - 1)):
+            return range(len(arrive))
+        return array("i", sorted(range(len(arrive)), key=arrive.__getitem__))
+
+    def reset(self):
+        """Forget the outcome of the last run
+        """
+        n = len(self)
+        self.wait = array("i", [0]) * n
+        self.start = array("i", [NEVER]) * n
+        self.end = array("i", [NEVER]) * n
+        self.status = array("b", [WAITING]) * n
+
+    def copy(self):
+        """A table of its own with the same customers and outcomes, e.g. to run while this one gets edited
+        """
+        table = CustomerTable()
+        for name in _COLUMNS:
+            setattr(table, name, array(getattr(self, name).typecode, getattr(self, name)))
+        table._names = list(self._names)
+        table._name_ids = dict(self._name_ids)
+        return table
+
+    def keep(self, flags):
+        """Keep the customers whose flag in `flags` (one per customer, an array or list) is true, drop the rest;
+        one pass over each column however many go
+        """
+        for name in _COLUMNS:
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, itertools.compress(column, flags)))
+
+    def nbytes(self):
+        """Memory taken by the columns (not counting the name pool)
+        """
+        return sum(getattr(self, name).itemsize * len(getattr(self, name)) for name in _COLUMNS)
+
+
+class TableCursor(object):
+    """The Manager's arrivals (see engine.ArrivalCursor) read off a CustomerTable by index:
+    minutes since `t_start`, Customers made only as they walk in
+    """
+
+    def __init__(self, table, t_start=0, order=None):
+        self.table = table
+        self.t_start = t_start
+        self.order = table.order() if order is None else order
+        self.pos = 0
+
+    def __len__(self):
+        return len(self.order) - self.pos
+
+    def seek(self, minute):
+        """Skip everyone arriving before `minute`
+        """
+        arrive, order, at = self.table.arrive, self.order, minute + self.t_start
+        while self.pos < len(order) and arrive[order[self.pos]] < at:
+            self.pos += 1
+
+    def peek(self):
+        if self.pos < len(self.order):
+            return self.table.arrive[self.order[self.pos]] - self.t_start
+        return None
+
+    def take(self, minute):
+        table, order, at = self.table, self.order, minute + self.t_start
+        customers = []
+        while self.pos < len(order) and table.arrive[order[self.pos]] == at:
+            customers.append(table.customer(order[self.pos]))
+            self.pos += 1
+        return customers
+
+
+class TableRecorder(object):
+    """Report callback writing each customer's outcome back into the table as they leave, then passing
+    the event on to `report` (if any)
+    """
+
+    def __init__(self, table, t_start=0, report=None):
+        self.table = table
+        self.t_start = t_start
+        self.report = report
+        self._inside = {}  # Row -> Customer, those who came in and haven't left
+
+    def __call__(self, minute, kind, subject):
+        if kind == ENTERED:
+            self._inside[subject.row] = subject
+        elif kind == CUT_STARTED:
+            self.table.start[subject.customer.row] = self.t_start + minute
+        elif kind == SERVED:
+            self.table.end[subject.row] = self.t_start + minute
+            self._leave(subject)
+        elif kind in (TOO_LATE, BALKED, RENEGED, TURNED_OUT):
+            self._leave(subject)
+        elif kind == CLOSED:
+            ## Still waiting or in the chair
+            for customer in list(self._inside.values()):
+                self._leave(customer)
+        if self.report is not None:
+            self.report(minute, kind, subject)
+
+    def _leave(self, customer):
+        table, row = self.table, customer.row
+        table.status[row] = _CODES[customer.status]
+        table.wait[row] = customer.wait_time
+        self._inside.pop(row, None)
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def run_table(table, barbers, seats, t_start=_OPEN_TIME, t_end=_CLOSING_TIME, report=None, **settings):
+    """manage_day() for a CustomerTable: run the day and fill in its wait / start / end / status columns.
+    `report` hears about every event as usual; returns the Manager
+    """
+    table.reset()
+    manager = open_shop((), barbers, seats, t_start, t_end, TableRecorder(table, t_start, report), **settings)
+    manager.add_arrivals(TableCursor(table, t_start))
+    manager.run()
+    return manager
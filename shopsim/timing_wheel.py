@@ -0,0 +1,168 @@
+"""
+Hierarchical timing wheel
+General Approach:
+    * Deadlines are whole minutes. Level 0 has 64 one-minute buckets, level 1 has 64 buckets of 64 minutes,
+      level 2 of 64**2 minutes and so on; anything further out than the top level waits in an overflow bucket
+    * An item sits on the lowest level whose parent bucket also holds the current minute, so insert and
+      cancel are O(1): one dict operation and one bit flip in that level's occupancy bitmap
+    * When the clock moves into a coarse bucket, its items come down a level (each item at most once per
+      level); only items whose deadline is actually up are handed back
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+_BITS = 6
+_SLOTS = 1 << _BITS  # Buckets per level
+_LEVELS = 4  # 64**4 minutes, about 31 years, before the overflow bucket
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class TimingWheel(object):
+    """Items keyed by deadline minute, handed back once the clock reaches it
+
+    Examples:
+    >>> wheel = TimingWheel()
+    >>> wheel.insert("Alto", 31); wheel.insert("Basil", 100); wheel.insert("Camphor", 31)
+    >>> wheel.cancel("Camphor")
+    >>> wheel.next_wakeup()
+    31
+    >>> wheel.expire(31)
+    ['Alto']
+    >>> wheel.next_wakeup(), wheel.expire(90), wheel.expire(100)
+    (64, [], ['Basil'])
+    """
+
+    def __init__(self, now=0):
+        self.now = now
+        self._buckets = [[None] * _SLOTS for _ in range(_LEVELS)]  # Each None or {item: deadline}
+        self._bitmaps = [0] * _LEVELS  # Bit n set <=> bucket n of that level is not empty
+        self._overflow = {}
+        self._where = {}  # Item -> (level, slot); level _LEVELS is the overflow bucket
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, item):
+        return item in self._where
+
+    def deadline(self, item):
+        """Minute `item` is due at, KeyError if it isn't on the wheel
+        """
+        level, slot = self._where[item]
+        return self._overflow[item] if level == _LEVELS else self._buckets[level][slot][item]
+
+    def insert(self, item, deadline):
+        """Hand `item` back once the clock reaches `deadline` (has to be in the future)
+        """
+        if deadline <= self.now:
+            raise ValueError("deadline {} is not after the current minute {}".format(deadline, self.now))
+        level = 0
+        while level < _LEVELS and (deadline >> (_BITS * (level + 1))) != (self.now >> (_BITS * (level + 1))):
+            level += 1
+        if level == _LEVELS:
+            self._overflow[item] = deadline
+            self._where[item] = (level, None)
+            return
+        slot = (deadline >> (_BITS * level)) & (_SLOTS - 1)
+        bucket = self._buckets[level][slot]
+        if bucket is None:
+            bucket = self._buckets[level][slot] = {}
+            self._bitmaps[level] |= 1 << slot
+        bucket[item] = deadline
+        self._where[item] = (level, slot)
+
+    def cancel(self, item):
+        """Forget about `item`, KeyError if it isn't on the wheel
+        """
+        level, slot = self._where.pop(item)
+        if level == _LEVELS:
+            del self._overflow[item]
+            return
+        bucket = self._buckets[level][slot]
+        del bucket[item]
+        if not bucket:
+            self._buckets[level][slot] = None
+            self._bitmaps[level] &= ~(1 << slot)
+
+    def next_wakeup(self):
+        """Earliest minute anything may be due, None if the wheel is empty
+        Exact within the current 64 minutes; further out it is the start of the next occupied bucket,
+        whose deadlines get sorted out when the clock gets there
+        """
+        for level in range(_LEVELS):
+            bits = self._bitmaps[level]
+            if bits:
+                shift = _BITS * level
+                parent = (self.now >> (shift + _BITS)) << (shift + _BITS)
+                return parent + (_lowest_bit(bits) << shift)
+        if self._overflow:
+            top = _BITS * _LEVELS
+            return ((self.now >> top) + 1) << top
+        return None
+
+    def expire(self, minute):
+        """Move the clock to `minute` and return the items that are due by then, earliest first
+        """
+        if minute < self.now:
+            raise ValueError("the clock can't go back from {} to {}".format(self.now, minute))
+        old, self.now = self.now, minute
+        due = []
+
+        ## Level 0 buckets the clock went past
+        self._drain(0, old + 1, minute, old, due)
+
+        ## Coarser buckets the clock moved into come down a level, top first so they can keep falling
+        top = _BITS * _LEVELS
+        if self._overflow and (minute >> top) != (old >> top):
+            overflow, self._overflow = self._overflow, {}
+            for item, deadline in overflow.items():
+                del self._where[item]
+                self._refile(item, deadline, due)
+        for level in range(_LEVELS - 1, 0, -1):
+            shift = _BITS * level
+            self._drain(level, (old >> shift) + 1, minute >> shift, old, due)
+
+        due.sort(key=lambda entry: entry[0])
+        return [item for _, item in due]
+
+    def _drain(self, level, first, last, old, due):
+        """Empty the buckets for blocks first..last (in this level's units) and refile what was in them
+        """
+        bits = self._bitmaps[level]
+        if not bits or first > last:
+            return
+        shift = _BITS * level
+        if (last >> _BITS) == (old >> (shift + _BITS)):  # Still in the same parent bucket
+            lo, hi = first & (_SLOTS - 1), last & (_SLOTS - 1)
+            bits &= ((1 << (hi + 1)) - 1) & ~((1 << lo) - 1)
+        while bits:
+            slot = _lowest_bit(bits)
+            bits &= bits - 1
+            bucket = self._buckets[level][slot]
+            self._buckets[level][slot] = None
+            self._bitmaps[level] &= ~(1 << slot)
+            for item, deadline in bucket.items():
+                del self._where[item]
+                self._refile(item, deadline, due)
+
+    def _refile(self, item, deadline, due):
+        if deadline <= self.now:
+            due.append((deadline, item))
+        else:
+            self.insert(item, deadline)
+
+
+##############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def _lowest_bit(bits):
+    """Index of the lowest set bit
+
+    Examples:
+    >>> _lowest_bit(0b101000)
+    3
+    """
+    return (bits & -bits).bit_length() - 1
@@ -0,0 +1,188 @@
+"""
+Binary event trace of a shop day
+General Approach:
+    * A TraceWriter is a report callback that writes one fixed-width record per event:
+      (minute, kind, customer id, barber id) as little-endian int32s, -1 where there is no customer / barber
+    * Customers and barbers get ids in the order they first show up; their names go to a small
+      `<trace>.names.json` next to the trace, so the trace itself is numbers only
+    * A Trace maps the file read-only (mmap): opening is instant whatever the size, records are decoded
+      on demand and the OS pages them in and out, so memory stays flat for replay and statistics
+"""
+
+##############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import collections
+import mmap
+import struct
+import sys
+
+from .engine import (OPENED, CLOSED, SHIFT_STARTED, ENTERED, TOO_LATE, BALKED, RENEGED, TURNED_OUT,
+                     CUT_STARTED, CUT_ENDED, SERVED, SHIFT_ENDED)
+
+## Event kinds by trace code, append only: the codes are in the files
+KINDS = (OPENED, CLOSED, SHIFT_STARTED, ENTERED, TOO_LATE, BALKED, RENEGED, TURNED_OUT,
+         CUT_STARTED, CUT_ENDED, SERVED, SHIFT_ENDED)
+CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+_MAGIC = b"SHOPTRC1"
+_HEADER = struct.Struct("<8sii")  # Magic, record size, opening time (minutes since midnight)
+_RECORD = struct.Struct("<iiii")  # Minute, kind code, customer id, barber id
+_FIELDS = ("minute", "kind", "customer", "barber")
+_BUFFER = 4096  # Records kept in memory before they go to disk
+_LEFT = frozenset((TOO_LATE, BALKED, RENEGED, TURNED_OUT, SERVED))  # A customer's last event
+_GONE = _LEFT | frozenset((SHIFT_ENDED,))  # Last event about their subject, customer or barber
+
+
+##############################################################################
+#                                  Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class TraceWriter(object):
+    """Writes the events it is handed as report(minute, kind, subject) to `path`
+    Use as a context manager, or call close() when the day is done
+    """
+
+    def __init__(self, path, t_start=0):
+        self.path = path
+        self.customers = []  # Names by customer id
+        self.barbers = []  # Names by barber id
+        ## id() of the customers / barbers in the shop -> trace id. Keyed by id() so the writer doesn't keep
+        ## anyone alive, and forgotten as they leave, before Python can hand their id() to somebody new
+        self._ids = {}
+        self._pending = bytearray()
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(_MAGIC, _RECORD.size, t_start))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __call__(self, minute, kind, subject):
+        customer = barber = -1
+        if subject is not None:
+            if hasattr(subject, "customer"):  # Barbers have a chair, customers don't
+                barber = self._id(subject, self.barbers)
+                if subject.customer is not None:
+                    customer = self._id(subject.customer, self.customers)
+            else:
+                customer = self._id(subject, self.customers)
+        self._pending += _RECORD.pack(minute, CODES[kind], customer, barber)
+        if kind in _GONE:
+            self._ids.pop(id(subject), None)
+        if len(self._pending) >= _BUFFER * _RECORD.size:
+            self.flush()
+
+    def _id(self, who, names):
+        number = self._ids.get(id(who))
+        if number is None:
+            number = self._ids[id(who)] = len(names)
+            names.append(who.name)
+        return number
+
+    def flush(self):
+        self._file.write(self._pending)
+        del self._pending[:]
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        import json  # Only needed here and in Trace.names(), keeps `import shopsim` quick
+        with open(self.path + ".names.json", "w") as names:
+            json.dump({"customers": self.customers, "barbers": self.barbers}, names)
+
+
+class Trace(object):
+    """A trace file, memory-mapped
+    trace[i] is the i-th (minute, kind, customer id, barber id) record, with the kind as a string
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size, self.t_start = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC or size != _RECORD.size:
+            self.close()
+            raise ValueError("{} is not a shop trace".format(path))
+        self._names = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return (len(self._map) - _HEADER.size) // _RECORD.size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("trace record out of range")
+        minute, code, customer, barber = _RECORD.unpack_from(self._map, _HEADER.size + i * _RECORD.size)
+        return minute, KINDS[code], customer, barber
+
+    def __iter__(self):
+        return self.events()
+
+    def close(self):
+        self._map.close()
+
+    def events(self, start=0, stop=None, chunk=_BUFFER):
+        """Records start..stop in order, decoded a chunk at a time
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        view = memoryview(self._map)
+        try:
+            for first in range(start, stop, chunk):
+                last = min(first + chunk, stop)
+                piece = view[_HEADER.size + first * _RECORD.size:_HEADER.size + last * _RECORD.size]
+                for minute, code, customer, barber in _RECORD.iter_unpack(piece):
+                    yield minute, KINDS[code], customer, barber
+                piece.release()
+        finally:
+            view.release()
+
+    def column(self, field):
+        """One field of every record, as a read-only sequence of ints straight over the mapped file
+        (a copy on big-endian machines)
+        """
+        i = _FIELDS.index(field)
+        if sys.byteorder == "little":
+            return memoryview(self._map)[_HEADER.size:].cast("i")[i::len(_FIELDS)]
+        return [record[i] for record in _RECORD.iter_unpack(self._map[_HEADER.size:])]
+
+    def counts(self):
+        """How often each kind of event happened
+        """
+        codes = collections.Counter(self.column("kind"))
+        return {KINDS[code]: count for code, count in codes.items()}
+
+    def names(self):
+        """{"customers": [...], "barbers": [...]} names by id, from the file next to the trace
+        """
+        if self._names is None:
+            import json
+            with open(self.path + ".names.json") as names:
+                self._names = json.load(names)
+        return self._names
+
+    def time_in_shop(self):
+        """Minutes from entering to leaving satisfied, for every customer that got a haircut
+        """
+        entered, spent = {}, []  # Only whoever is in the shop is in `entered`
+        for minute, kind, customer, barber in self.events():
+            if kind == ENTERED:
+                entered[customer] = minute
+            elif kind == SERVED:
+                spent.append(minute - entered.pop(customer))
+            elif kind in _LEFT:
+                entered.pop(customer, None)
+            elif kind == CLOSED:
+                entered.clear()
+        return spent